@@ -9,8 +9,23 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'christmas_day.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    # resolves against ASGI_URLCONF, where the feed, profile and notifications views
+    # are async; under WSGI those would be buffered, so ROOT_URLCONF keeps them sync
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_URLCONF
+        return request, error_response
+
+
+application = AsyncViewsASGIHandler()
@@ -0,0 +1,19 @@
+"""
+URL configuration used by christmas_day.asgi.
+
+Same routes as christmas_day.urls, except that the read-heavy feed, profile and
+notification endpoints are native async views (sm.async_views).
+"""
+from django.urls import path
+
+from sm import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+
+urlpatterns = [
+    path("", async_views.home_feed, name="home"),
+    path("home/", async_views.home_feed, name="home"),
+    path("profile/<str:username>/", async_views.user_profile, name="other_user_profile"),
+    path("notifications/", async_views.get_notifications, name="get_notifications"),
+] + sync_urlpatterns
@@ -54,21 +54,25 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'sm.authentication.CachedJWTAuthentication',
     ),
     "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer" # this allows for navigation to any endpoint from anywhere - security liability in deployment
+        "sm.renderers.ORJSONRenderer",
+    ) + (
+        # this allows for navigation to any endpoint from anywhere - security liability in deployment, so debug only
+        ("rest_framework.renderers.BrowsableAPIRenderer",) if DEBUG else ()
     )
 }
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    "sm.middleware.CompressionMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    "sm.middleware.RequestProfilerMiddleware",
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -107,9 +111,22 @@ CORS_ALLOW_HEADERS = [
     'origin',
     'user-agent',
     'x-csrftoken',
-    'x-requested-with'
+    'x-requested-with',
+    'x-profile'
 ]
 
+# staff-only request profiling (X-Profile: 1 header or ?profile=1)
+REQUEST_PROFILING_ENABLED = True
+REQUEST_PROFILING_TOP_FUNCTIONS = 30
+
+# response compression (gzip, or brotli when installed)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CACHE = "compression"
+COMPRESSION_CACHE_TIMEOUT = 300
+# bodies larger than this are compressed every time; with the alias' MAX_ENTRIES it
+# bounds the cache at roughly 64 x 256 KB per process
+COMPRESSION_CACHE_MAX_SIZE = 256 * 1024
+
 # twilio section, not nee
 TWILIO_ACCOUNT_SID = ssm.get_parameter(Name="/django-01-tyn/twilio-sid", WithDecryption=True)["Parameter"]["Value"]
 TWILIO_AUTH_TOKEN = ssm.get_parameter(Name="/django-01-tyn/twilio-auth-token", WithDecryption=True)["Parameter"]["Value"]
@@ -117,6 +134,10 @@ TWILIO_PHONE_NUMBER = ssm.get_parameter(Name="/django-01-tyn/twilio-phone-number
 
 ROOT_URLCONF = 'christmas_day.urls'
 
+# christmas_day.asgi resolves here instead: the same routes with async feed, profile
+# and notification views
+ASGI_URLCONF = 'christmas_day.asgi_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -145,9 +166,48 @@ DATABASES = {
     }
 }
 
+# per-process cache; point this at a shared backend when running several workers
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "thank-you-notes",
+    },
+    # CachedJWTAuthentication's users. files are shared by every worker on the host (as
+    # the SQLite database is), so a save or deactivation drops the entry for all of them
+    "users": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "users",
+    },
+    # compressed response bodies, kept apart so large, mostly per-viewer bodies never
+    # cull the auth, following and progress entries in "default"
+    "compression": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "thank-you-notes-compression",
+        "OPTIONS": {"MAX_ENTRIES": 64},
+    },
+}
+
+USER_SEARCH_CACHE_TIMEOUT = 60
+
+# me/progress/ payloads; every post save or delete drops its author's entry, in the
+# saving worker only, so keep this short while "default" is per-process
+PROGRESS_CACHE_TIMEOUT = 60
+
+# per-user followed-id arrays (sm.utils.following_ids); follow writes drop them, but
+# only in the worker that made them while "default" is per-process, so the TTL is what
+# bounds how long other workers serve a stale set
+FOLLOWING_CACHE_TIMEOUT = 60
+
+# sync/ tokens older than this get 410 Gone, purge_tombstones deletes past it
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+# how long CachedJWTAuthentication may serve a user without re-reading the row
+AUTH_USER_CACHE = "users"
+AUTH_USER_CACHE_TIMEOUT = 60
+
 STORAGES = {
     "default": {
-        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "BACKEND": "sm.storage.CDNStorage",
     },
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
@@ -181,6 +241,9 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True
 }
 
+# rotated refresh tokens are blacklisted in sm.models.RevokedToken (sm.tokens), not in
+# the token_blacklist app; purge_revoked_tokens drops the expired rows
+
 # add in HTTPS redirect and security hardening
 #
 #
@@ -240,11 +303,10 @@ AWS_S3_ENDPOINT_URL = f"https://s3.{AWS_S3_REGION_NAME}.amazonaws.com"
 AWS_DEFAULT_ACL = None
 AWS_S3_FILE_OVERWRITE = False
 
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
-
 MEDIA_LOCATION = "media"
 AWS_LOCATION = MEDIA_LOCATION
-MEDIA_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com/{MEDIA_LOCATION}/"
+# media is served through CloudFront, the same host CDNStorage.url() builds
+MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/{MEDIA_LOCATION}/"
 
 # authentication model
 AUTH_USER_MODEL = "sm.CustomUser"
@@ -19,15 +19,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
-from rest_framework_simplejwt.views import TokenRefreshView
-from sm.views import CustomTokenObtainPairView
+from sm.views import CustomTokenObtainPairView, CustomTokenRefreshView
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("", include("sm.urls")),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token_refresh/', TokenRefreshView.as_view(), name='token_refresh')
+    path('token_refresh/', CustomTokenRefreshView.as_view(), name='token_refresh')
 ]
 
 # urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,44 +1,178 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
 from .models import CustomUser, Post, Comment, PostLike, CommentLike, Follow, Notification
+from .search import POST_FTS_TABLE, COMMENT_FTS_TABLE, fts_query, matching_ids_sql
+from .utils import restore_post, soft_delete_post, soft_delete_user
+
+# changelists stop counting here and show "10000+"-sized pagination instead
+ESTIMATED_COUNT_LIMIT = 10000
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator that never runs a full COUNT(*).
+
+    Unfiltered lists use the highest id as the total. Filtered ones count at most
+    ESTIMATED_COUNT_LIMIT rows, or up to the page after page_number when that is
+    deeper, so there is always a next page while more rows match.
+    """
+
+    def __init__(self, *args, page_number=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.page_number = page_number
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.aggregate(top=Max("pk"))["top"] or 0
+        limit = max(ESTIMATED_COUNT_LIMIT, (self.page_number + 1) * self.per_page)
+        return queryset.order_by()[:limit].count()
+
+class LargeChangelistMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # id follows created_at, and sorting on the primary key needs no extra index
+    ordering = ("-id",)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            page_number = max(int(request.GET.get(PAGE_VAR, 1)), 1)
+        except ValueError:
+            page_number = 1
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, page_number=page_number
+        )
+
+class SoftDeleteAdminMixin:
+    # deleting here would skip the tombstones and cache upkeep, purge_deleted does the hard deletes
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class UsernameFilter(admin.SimpleListFilter):
+    """
+    Exact-username text box instead of a sidebar link for every user.
+
+    Subclasses set title, parameter_name and field (the user FK to filter on).
+    """
+    template = "admin/sm/username_filter.html"
+    field = None
+
+    def lookups(self, request, model_admin):
+        # the filter is only rendered when there is at least one lookup
+        return (("", ""),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice["query_parts"] = [
+            (name, value)
+            for name, values in changelist.get_filters_params().items()
+            if name != self.parameter_name
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f"{self.field}__username": self.value()})
+        return queryset
+
+def username_filter(field, title=None):
+    return type(f"{field.title()}UsernameFilter", (UsernameFilter,), {
+        "title": title or field,
+        "parameter_name": field,
+        "field": field
+    })
 
 # Register your models here.
 
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
-    list_display = ("username", "first_name", "last_name", "bio", "profile_picture", "is_phone_verified", "is_staff")
-    list_filter = ("is_phone_verified", "is_active", "is_staff")
+class CustomUserAdmin(SoftDeleteAdminMixin, LargeChangelistMixin, UserAdmin):
+    list_display = ("username", "first_name", "last_name", "bio", "profile_picture", "is_phone_verified", "is_staff", "deleted_at")
+    list_filter = ("is_phone_verified", "is_active", "is_staff", ("deleted_at", admin.EmptyFieldListFilter))
+    actions = ["soft_delete_selected"]
+
+    @admin.action(description="Soft delete selected users (purge_deleted removes their data)")
+    def soft_delete_selected(self, request, queryset):
+        for user in queryset.filter(deleted_at__isnull=True):
+            soft_delete_user(user)
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("id", "author", "status", "what", "who", "note", "gift_image", "created_at", "updated_at")
-    list_filter = ("author", "status", "created_at")
+class PostAdmin(SoftDeleteAdminMixin, LargeChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "author", "status", "what", "who", "note", "gift_image", "created_at", "updated_at", "deleted_at")
+    list_filter = (username_filter("author"), "status", ("deleted_at", admin.EmptyFieldListFilter), "created_at")
+    list_select_related = ("author",)
+    raw_id_fields = ("author",)
     search_fields = ("what", "who", "note")
+    actions = ["soft_delete_selected", "restore_selected"]
+
+    def get_queryset(self, request):
+        # soft-deleted posts stay listed so they can be inspected and restored
+        queryset = Post.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    @admin.action(description="Soft delete selected posts (purge_deleted removes their data)")
+    def soft_delete_selected(self, request, queryset):
+        for post in queryset.filter(deleted_at__isnull=True):
+            soft_delete_post(post)
+
+    @admin.action(description="Restore selected soft-deleted posts")
+    def restore_selected(self, request, queryset):
+        # posts of deleted users go with their author
+        for post in queryset.filter(deleted_at__isnull=False, author__deleted_at__isnull=True):
+            restore_post(post)
+
+    def get_search_results(self, request, queryset, search_term):
+        if fts_query(search_term) is None:
+            return queryset, False
+        sql, params = matching_ids_sql(POST_FTS_TABLE, search_term)
+        return queryset.filter(pk__in=RawSQL(sql, params)), False
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeChangelistMixin, admin.ModelAdmin):
     list_display= ("id", "author", "post", "text", "created_at")
-    list_filter = ("author", "created_at")
+    list_filter = (username_filter("author"), "created_at")
+    list_select_related = ("author", "post")
+    raw_id_fields = ("author", "post")
     search_fields = ("text",)
 
+    def get_search_results(self, request, queryset, search_term):
+        if fts_query(search_term) is None:
+            return queryset, False
+        sql, params = matching_ids_sql(COMMENT_FTS_TABLE, search_term)
+        return queryset.filter(pk__in=RawSQL(sql, params)), False
+
 @admin.register(PostLike)
-class PostLikeAdin(admin.ModelAdmin):
+class PostLikeAdin(LargeChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "user", "post", "created_at")
-    list_filter = ("user", "created_at")
+    list_filter = (username_filter("user"), "created_at")
+    list_select_related = ("user", "post")
+    raw_id_fields = ("user", "post")
 
 @admin.register(CommentLike)
-class CommentLikeAdmin(admin.ModelAdmin):
+class CommentLikeAdmin(LargeChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "user", "comment", "created_at")
-    list_filter = ("user", "created_at")
+    list_filter = (username_filter("user"), "created_at")
+    list_select_related = ("user", "comment")
+    raw_id_fields = ("user", "comment")
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "follower", "following", "created_at")
-    list_filter = ("created_at",)
-    search_fields = ("follower__username", "following__username")
+    list_filter = (username_filter("follower"), username_filter("following"), "created_at")
+    list_select_related = ("follower", "following")
+    raw_id_fields = ("follower", "following")
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "recipient", "sender", "notification_type", "is_read", "created_at")
-    list_filter = ("notification_type", "is_read", "created_at")
-    search_fields = ("recipient__username", "sender__username")
\ No newline at end of file
+    list_filter = (username_filter("recipient"), username_filter("sender"), "notification_type", "is_read", "created_at")
+    list_select_related = ("recipient", "sender")
+    raw_id_fields = ("recipient", "sender", "post", "comment")
\ No newline at end of file
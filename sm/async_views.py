@@ -0,0 +1,171 @@
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import CustomUser, Follow, Notification, Post
+from .renderers import astreaming_json_response
+from .serializers import NotificationSerializer, PostSerializer, UserProfileSerializer
+from .utils import annotate_posts, following_ids, user_stats
+from .views import FEED_CHUNK_SIZE, FOLLOWING_IN_LIST_LIMIT, post_user_ids, rendered_fields
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines.
+
+    DRF dispatches synchronously, so the usual APIView.initial (authentication,
+    permissions, throttling, content negotiation) runs in one thread hop and the
+    handler itself is awaited on the event loop. Errors go through the same
+    handle_exception / finalize_response as any other view.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if not isinstance(response, Response) and hasattr(response, "__await__"):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names):
+
+    # @api_view for `async def` views; @permission_classes and friends work the same way
+    def decorator(func):
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        attrs = {method.lower(): handler for method in http_method_names}
+        attrs["__doc__"] = func.__doc__
+        for name in ("renderer_classes", "parser_classes", "authentication_classes",
+                     "throttle_classes", "permission_classes"):
+            if hasattr(func, name):
+                attrs[name] = getattr(func, name)
+
+        return type("WrappedAsyncAPIView", (AsyncAPIView,), attrs).as_view()
+
+    return decorator
+
+
+async def serialized_pages(rows, serializer_class, request, user_ids):
+
+    # views.serialized_pages over an async queryset iterator: FEED_CHUNK_SIZE rows at
+    # a time, with the nested users' follow stats fetched once per page
+    page = []
+    async for row in rows:
+        page.append(row)
+        if len(page) == FEED_CHUNK_SIZE:
+            for item in await serialize_page(page, serializer_class, request, user_ids):
+                yield item
+            page = []
+
+    if page:
+        for item in await serialize_page(page, serializer_class, request, user_ids):
+            yield item
+
+
+async def serialize_page(page, serializer_class, request, user_ids):
+    ids = {user_id for obj in page for user_id in user_ids(obj)}
+    context = {"request": request, **await sync_to_async(user_stats)(ids, request.user)}
+    return serializer_class(page, many=True, context=context).data
+
+
+# Routed by christmas_day.asgi_urls only; WSGI keeps the sync views, whose bodies
+# stream without being buffered first
+@async_api_view(["GET"])
+@permission_classes([IsAuthenticated])
+async def home_feed(request):
+
+    filter_type = request.GET.get("filter", "all")
+
+    if filter_type == "following":
+        following = await sync_to_async(following_ids)(request.user)
+        if len(following) > FOLLOWING_IN_LIST_LIMIT:
+            authors = Follow.objects.filter(follower=request.user).values_list("following", flat=True)
+        else:
+            authors = list(following)
+        posts = Post.objects.filter(author__in=authors).order_by("-created_at")
+    elif filter_type == "popular":
+        posts = Post.objects.order_by("-hot_score", "-id")
+    else:
+        posts = Post.objects.all().order_by("-created_at")
+
+    fields = rendered_fields(PostSerializer, request)
+    posts = annotate_posts(posts, request.user, fields)
+
+    return astreaming_json_response(
+        serialized_pages(posts.aiterator(chunk_size=FEED_CHUNK_SIZE), PostSerializer, request, post_user_ids(fields))
+    )
+
+@async_api_view(["GET"])
+@permission_classes([IsAuthenticated])
+async def user_profile(request, username):
+    user = await CustomUser.objects.filter(username=username).afirst()
+
+    if user is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    fields = rendered_fields(PostSerializer, request)
+    posts = annotate_posts(Post.objects.filter(author=user).order_by("-created_at"), request.user, fields)
+    following = await sync_to_async(following_ids)(request.user)
+
+    data = {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "profile_picture": user.profile_picture.url if user.profile_picture else None,
+        "is_following": user.id in following,
+        "follower_count": await user.followers.filter(follower__deleted_at__isnull=True).acount(),
+        "following_count": await user.following.filter(following__deleted_at__isnull=True).acount(),
+        "post_count": await user.posts.acount(),
+        "is_own_profile": user == request.user,
+        "posts": [
+            post async for post in serialized_pages(
+                posts.aiterator(chunk_size=FEED_CHUNK_SIZE), PostSerializer, request, post_user_ids(fields)
+            )
+        ]
+    }
+
+    return Response(data)
+
+@async_api_view(["GET"])
+@permission_classes([IsAuthenticated])
+async def get_notifications(request):
+    notifications = (
+        Notification.objects
+        .filter(recipient=request.user, sender__deleted_at__isnull=True)
+        .select_related("sender", "post")
+    )
+
+    unread_count = await notifications.filter(is_read=False).acount()
+
+    with_sender = isinstance(rendered_fields(NotificationSerializer, request).get("sender"), UserProfileSerializer)
+
+    return astreaming_json_response(
+        serialized_pages(
+            notifications.aiterator(chunk_size=FEED_CHUNK_SIZE), NotificationSerializer, request,
+            lambda notification: [notification.sender_id] if with_sender else []
+        ),
+        envelope={"unread_count": unread_count},
+        key="notifications"
+    )
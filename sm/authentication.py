@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import auth_user_cache, auth_user_cache_key
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from a short-TTL cache instead of
+    selecting the CustomUser row on every request. CustomUser.save() and delete() drop
+    the entry, so profile edits, phone verification, deactivation and password changes
+    are visible on the next request. That only holds when every worker shares the
+    cache (AUTH_USER_CACHE).
+
+    request.user may therefore be a slightly old copy: views that write to the user
+    load the row again first (views.current_user_row).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = auth_user_cache_key(user_id)
+        cache = auth_user_cache()
+        user = cache.get(key)
+
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # same checks JWTAuthentication.get_user runs on a freshly loaded row
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,226 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Comment, CommentLike, CustomUser, Follow, Notification, Post, PostLike
+from .search import adjust_follower_count
+from .utils import MAX_ID, delete_notifications, forget_following
+
+
+MAX_BATCH_OPERATIONS = 100
+
+# op name -> (relation, desired state)
+RELATION_OPS = {
+    "like_post": ("post_like", True),
+    "unlike_post": ("post_like", False),
+    "like_comment": ("comment_like", True),
+    "unlike_comment": ("comment_like", False),
+    "follow": ("follow", True),
+    "unfollow": ("follow", False),
+}
+
+NOTIFICATION_OPS = ("mark_notification_read", "delete_notification")
+
+
+class Relation:
+    """How one toggleable relation (like, follow) is stored and notified."""
+
+    def __init__(self, model, user_field, target_field, notification_type, notification_target):
+        self.model = model
+        self.user_field = user_field
+        self.target_field = target_field
+        self.notification_type = notification_type
+        self.notification_target = notification_target
+
+    def existing(self, user, target_ids):
+        return set(
+            self.model.objects
+            .filter(**{self.user_field: user.id, f"{self.target_field}__in": target_ids})
+            .values_list(self.target_field, flat=True)
+        )
+
+    def insert(self, user, target_ids):
+        self.model.objects.bulk_create(
+            [self.model(**{self.user_field: user.id, self.target_field: target_id}) for target_id in target_ids],
+            ignore_conflicts=True
+        )
+
+    def delete(self, user, target_ids):
+        self.model.objects.filter(
+            **{self.user_field: user.id, f"{self.target_field}__in": target_ids}
+        ).delete()
+
+    def notifications(self, user, owners, target_ids):
+        rows = []
+        for target_id in target_ids:
+            recipient_id = owners[target_id]
+            if recipient_id == user.id:
+                continue
+            notification = Notification(
+                recipient_id=recipient_id,
+                sender_id=user.id,
+                notification_type=self.notification_type
+            )
+            if self.notification_target:
+                setattr(notification, self.notification_target, target_id)
+            rows.append(notification)
+        return rows
+
+    def delete_notifications(self, user, target_ids):
+        lookup = {"sender_id": user.id, "notification_type": self.notification_type}
+        if self.notification_target:
+            lookup[f"{self.notification_target}__in"] = target_ids
+        else:
+            lookup["recipient_id__in"] = target_ids
+        delete_notifications(Notification.objects.filter(**lookup))
+
+
+RELATIONS = {
+    "post_like": Relation(PostLike, "user_id", "post_id", "like_post", "post_id"),
+    "comment_like": Relation(CommentLike, "user_id", "comment_id", "like_comment", "comment_id"),
+    "follow": Relation(Follow, "follower_id", "following_id", "follow", None),
+}
+
+
+def parse_operation(operation):
+
+    # returns (op, target) or raises ValueError with a client-facing message
+    if not isinstance(operation, dict):
+        raise ValueError("Each operation must be an object")
+
+    op = operation.get("op")
+    if op not in RELATION_OPS and op not in NOTIFICATION_OPS:
+        raise ValueError(f"Unknown op: {op}")
+
+    if op in ("follow", "unfollow"):
+        username = operation.get("username")
+        if not isinstance(username, str) or not username:
+            raise ValueError("username is required")
+        return op, username
+
+    target = operation.get("id")
+    if isinstance(target, bool) or not isinstance(target, int) or not 1 <= target <= MAX_ID:
+        raise ValueError("id must be an integer")
+    return op, target
+
+
+def resolve_owners(parsed):
+
+    # one query per target type: target id -> owner id (the notification recipient)
+    wanted = {"post_like": set(), "comment_like": set(), "follow": set()}
+    for op, target in parsed:
+        if op in RELATION_OPS:
+            wanted[RELATION_OPS[op][0]].add(target)
+
+    owners = {
+        "post_like": dict(Post.objects.filter(id__in=wanted["post_like"]).values_list("id", "author_id")),
+        "comment_like": dict(Comment.objects.filter(id__in=wanted["comment_like"]).values_list("id", "author_id")),
+        "follow": {},
+    }
+
+    usernames = dict(CustomUser.objects.filter(username__in=wanted["follow"]).values_list("username", "id"))
+    owners["follow"] = {user_id: user_id for user_id in usernames.values()}
+
+    return owners, usernames
+
+
+def run_batch(user, operations):
+    """
+    Apply an ordered list of like / follow / notification operations for user.
+
+    Operations are replayed in memory against the starting state so each one gets
+    its own result, then only the net change per relation is written with bulk
+    inserts and deletes, all inside a single transaction.
+    """
+    parsed = []
+    results = []
+    for operation in operations:
+        try:
+            parsed.append(parse_operation(operation))
+            results.append(None)
+        except ValueError as error:
+            parsed.append((None, None))
+            results.append({"status": 400, "error": str(error)})
+
+    with transaction.atomic():
+        owners, usernames = resolve_owners([item for item in parsed if item[0]])
+
+        states = {}
+        for name, relation in RELATIONS.items():
+            states[name] = relation.existing(user, list(owners[name]))
+        initial = {name: set(state) for name, state in states.items()}
+
+        notification_ids = {target for op, target in parsed if op in NOTIFICATION_OPS}
+        notifications = set(
+            Notification.objects.filter(recipient=user, id__in=notification_ids).values_list("id", flat=True)
+        )
+        read_ids = set()
+        deleted_ids = set()
+
+        for index, (op, target) in enumerate(parsed):
+            if op is None:
+                continue
+
+            results[index] = {"op": op}
+
+            if op in NOTIFICATION_OPS:
+                if target not in notifications:
+                    results[index].update({"status": 404, "error": "Notification not found"})
+                    continue
+                if op == "delete_notification":
+                    notifications.discard(target)
+                    deleted_ids.add(target)
+                    results[index]["status"] = 204
+                else:
+                    read_ids.add(target)
+                    results[index]["status"] = 200
+                continue
+
+            name, desired = RELATION_OPS[op]
+            if name == "follow":
+                target = usernames.get(target)
+                if target == user.id:
+                    results[index].update({"status": 400, "error": "You cannot follow yourself"})
+                    continue
+
+            if target not in owners[name]:
+                results[index].update({"status": 404, "error": "Not found"})
+                continue
+
+            created = desired and target not in states[name]
+            if desired:
+                states[name].add(target)
+            else:
+                states[name].discard(target)
+
+            key = "following" if name == "follow" else "liked"
+            results[index].update({"status": 201 if created else 200, key: desired})
+
+        new_notifications = []
+        for name, relation in RELATIONS.items():
+            added = states[name] - initial[name]
+            removed = initial[name] - states[name]
+
+            if removed:
+                relation.delete(user, removed)
+                relation.delete_notifications(user, removed)
+            if added:
+                relation.insert(user, added)
+                new_notifications.extend(relation.notifications(user, owners[name], added))
+
+            if name == "follow":
+                for user_id in added:
+                    adjust_follower_count(user_id, 1)
+                for user_id in removed:
+                    adjust_follower_count(user_id, -1)
+                if added or removed:
+                    forget_following([user.id])
+
+        Notification.objects.bulk_create(new_notifications)
+
+        read_ids -= deleted_ids
+        if read_ids:
+            Notification.objects.filter(id__in=read_ids).update(is_read=True, updated_at=timezone.now())
+        if deleted_ids:
+            delete_notifications(Notification.objects.filter(id__in=deleted_ids))
+
+    return results
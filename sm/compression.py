@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .renderers import dumps
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def parse_accept_encoding(header):
+
+    # "gzip;q=0.5, br" -> {"gzip": 0.5, "br": 1.0}
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, encodings=None):
+
+    # best encoding we support that the client accepts, server preference breaks ties
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings or available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CachedBody:
+
+    # a view's cached JSON body with its compressed forms built once at fill time; it
+    # lives in the view's own cache entry, so a hit skips rendering and compression
+    # and invalidating the entry drops every encoding with it
+    def __init__(self, data):
+        self.content = dumps(data)
+        self.encoded = {}
+        if len(self.content) >= settings.COMPRESSION_MIN_SIZE:
+            for encoding in available_encodings():
+                compressed = compress(self.content, encoding)
+                if len(compressed) < len(self.content):
+                    self.encoded[encoding] = compressed
+
+
+def cached_compress(body, encoding):
+
+    # other buffered GETs: identical bodies (same profile page) are only compressed
+    # once, though each hit still renders and hashes the body to find its entry
+    max_size = getattr(settings, "COMPRESSION_CACHE_MAX_SIZE", 0)
+    if len(body) > max_size:
+        return compress(body, encoding)
+
+    cache = caches[getattr(settings, "COMPRESSION_CACHE", "compression")]
+    key = f"compressed:{encoding}:{hashlib.blake2b(body, digest_size=16).hexdigest()}"
+
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(body, encoding)
+        cache.set(key, compressed, getattr(settings, "COMPRESSION_CACHE_TIMEOUT", 300))
+    return compressed
+
+
+async def acompress_sequence(chunks):
+
+    # django.utils.text.compress_sequence for async bodies: one gzip stream, flushed
+    # per chunk so the client sees data as soon as the view produces it
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
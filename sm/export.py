@@ -0,0 +1,165 @@
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, PostLike
+from .renderers import STREAM_CHUNK_SIZE, dumps
+
+
+# rows fetched per round trip while walking a user's data
+EXPORT_CHUNK_SIZE = 500
+IMAGE_CHUNK_SIZE = 256 * 1024
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+def export_records(user):
+
+    # (type, row) pairs for everything the user wrote or received, oldest first,
+    # read with server-side chunked iterators so no list of rows is ever built
+    yield "user", {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "bio": user.bio,
+        "profile_picture": user.profile_picture.name or None,
+        "profile_picture_url": image_url(user.profile_picture.name),
+        "date_joined": user.date_joined
+    }
+
+    posts = (
+        Post.objects.filter(author=user)
+        .order_by("id")
+        .values("id", "what", "who", "note", "status", "gift_image", "created_at", "updated_at")
+    )
+    for post in posts.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        post["gift_image"] = post["gift_image"] or None
+        post["gift_image_url"] = image_url(post["gift_image"])
+        yield "post", post
+
+    comments = (
+        Comment.objects.filter(post__author=user, post__deleted_at__isnull=True)
+        .order_by("id")
+        .values("id", "post_id", "author__username", "text", "created_at")
+    )
+    for comment in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield "comment", comment
+
+    likes = (
+        PostLike.objects.filter(post__author=user, post__deleted_at__isnull=True)
+        .order_by("id")
+        .values("post_id", "user__username", "created_at")
+    )
+    for like in likes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield "like", like
+
+    followers = (
+        Follow.objects.filter(following=user)
+        .order_by("id")
+        .values("follower__username", "created_at")
+    )
+    for follower in followers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield "follower", follower
+
+
+def stream_ndjson(user):
+
+    # one JSON object per line, flushed in STREAM_CHUNK_SIZE pieces
+    buffer = bytearray()
+    for kind, row in export_records(user):
+        buffer += dumps({"type": kind, **row})
+        buffer += b"\n"
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def image_names(user):
+
+    # keys are content addressed, so identical uploads share one name; each goes
+    # into the archive once
+    avatar = user.profile_picture.name
+    if avatar:
+        yield avatar
+
+    names = (
+        Post.objects.filter(author=user)
+        .exclude(gift_image="")
+        .exclude(gift_image__isnull=True)
+        .order_by("gift_image")
+        .values_list("gift_image", flat=True)
+        .distinct()
+    )
+    for name in names.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        if name != avatar:
+            yield name
+
+
+def storage_chunks(name):
+
+    # S3 files expose the boto3 object, whose body can be streamed; reading the
+    # S3File itself would first download the whole image into a temp file
+    with default_storage.open(name, "rb") as file:
+        obj = getattr(file, "obj", None)
+        if obj is not None:
+            yield from obj.get()["Body"].iter_chunks(IMAGE_CHUNK_SIZE)
+        else:
+            yield from file.chunks(IMAGE_CHUNK_SIZE)
+
+
+class ZipStream:
+    """
+    Write-only target for zipfile that hands everything written back to the caller.
+
+    It has no seek() or tell(), so zipfile writes each member with a data descriptor
+    instead of going back to patch its header, and the archive can be streamed out.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_zip(user):
+    stream = ZipStream()
+    date_time = timezone.now().timetuple()[:6]
+
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("export.ndjson", "w", force_zip64=True) as member:
+            for chunk in stream_ndjson(user):
+                member.write(chunk)
+                if len(stream.buffer) >= STREAM_CHUNK_SIZE:
+                    yield stream.drain()
+
+        for name in image_names(user):
+            if not default_storage.exists(name):
+                continue
+
+            # images are already compressed, store them as-is
+            info = zipfile.ZipInfo(f"images/{name}", date_time)
+            info.compress_type = zipfile.ZIP_STORED
+            with archive.open(info, "w", force_zip64=True) as member:
+                for chunk in storage_chunks(name):
+                    member.write(chunk)
+                    if len(stream.buffer) >= STREAM_CHUNK_SIZE:
+                        yield stream.drain()
+
+    yield stream.drain()
@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from sm.compression import available_encodings, cached_compress, compress
+from sm.renderers import dumps
+
+
+def fake_user(user_id):
+    return {
+        "id": user_id,
+        "username": f"user{user_id}",
+        "first_name": random.choice(["Ana", "Ben", "Cleo", "Dev", "Eli"]),
+        "last_name": random.choice(["Lopez", "Nguyen", "Smith", "Okafor"]),
+        "profile_picture": f"https://deg8qekodna74.cloudfront.net/media/profile_pic/{user_id}.jpg",
+        "is_phone_verified": True,
+        "followers_count": random.randint(0, 500),
+        "following_count": random.randint(0, 500),
+        "is_following": random.random() < 0.3
+    }
+
+
+def fake_feed(posts, comments_per_post, users):
+    """A home_feed-shaped payload: full author objects on every post and comment."""
+    feed = []
+    comment_id = 0
+    for post_id in range(posts, 0, -1):
+        comments = []
+        for _ in range(comments_per_post):
+            comment_id += 1
+            comments.append({
+                "id": comment_id,
+                "author": fake_user(random.randint(1, users)),
+                "post": post_id,
+                "text": random.choice(["so thoughtful!", "love this", "what a great gift", "aww"]),
+                "like_count": random.randint(0, 20),
+                "is_liked": False,
+                "created_at": "2025-12-24T18:30:00.000000-05:00",
+                "updated_at": "2025-12-24T18:30:00.000000-05:00"
+            })
+        feed.append({
+            "id": post_id,
+            "author": fake_user(random.randint(1, users)),
+            "what": random.choice(["wool scarf", "cookbook", "concert tickets", "hand-made mug"]),
+            "who": random.choice(["grandma", "aunt mae", "my roommate", "coach"]),
+            "note": "Thank you so much for thinking of me this year, it means a lot!",
+            "gift_image": f"https://deg8qekodna74.cloudfront.net/media/blog_img/{post_id}.jpg",
+            "status": random.choice(["not_started", "drafted", "sent"]),
+            "like_count": random.randint(0, 50),
+            "comments": comments,
+            "comment_count": len(comments),
+            "is_liked": False,
+            "created_at": "2025-12-24T18:00:00.000000-05:00",
+            "updated_at": "2025-12-24T18:00:00.000000-05:00"
+        })
+    return feed
+
+
+class Command(BaseCommand):
+    help = "Measure bytes saved and CPU cost of response compression on seeded feed payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000", help="comma separated post counts")
+        parser.add_argument("--comments", type=int, default=3, help="comments per post")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        repeat = options["repeat"]
+
+        self.stdout.write(
+            f"{'posts':>6} {'enc':>5} {'raw':>10} {'compressed':>11} {'saved':>7} "
+            f"{'compress ms':>12} {'MB/s':>8} {'cached ms':>10}"
+        )
+
+        for posts in (int(size) for size in options["sizes"].split(",")):
+            body = dumps(fake_feed(posts, options["comments"], users=max(posts // 2, 10)))
+
+            for encoding in available_encodings():
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    compressed = compress(body, encoding)
+                compress_ms = (time.perf_counter() - started) * 1000 / repeat
+
+                cached_compress(body, encoding)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    cached_compress(body, encoding)
+                cached_ms = (time.perf_counter() - started) * 1000 / repeat
+
+                saved = 1 - len(compressed) / len(body)
+                throughput = len(body) / 1e6 / (compress_ms / 1000)
+                self.stdout.write(
+                    f"{posts:>6} {encoding:>5} {len(body):>10} {len(compressed):>11} {saved:>7.1%} "
+                    f"{compress_ms:>12.3f} {throughput:>8.1f} {cached_ms:>10.3f}"
+                )
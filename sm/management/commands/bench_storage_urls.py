@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from sm.storage import CDNStorage, cdn_url
+
+
+def storage_options(**overrides):
+    # fixed dummy credentials: building URLs never talks to AWS
+    options = {
+        "bucket_name": "bench-bucket",
+        "region_name": "us-west-1",
+        "access_key": "AKIABENCHMARK",
+        "secret_key": "bench-secret",
+        "location": "media",
+        "signature_version": "s3v4",
+    }
+    options.update(overrides)
+    return options
+
+
+class Command(BaseCommand):
+    help = "Measure image URLs generated per second: presigned S3, plain custom domain and CDNStorage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--urls", type=int, default=20000, help="url() calls per backend")
+        parser.add_argument("--keys", type=int, default=500, help="distinct object keys, e.g. avatars on a feed")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        keys = [f"profile_pic/{index}.jpg" for index in range(options["keys"])]
+        names = [random.choice(keys) for _ in range(options["urls"])]
+
+        backends = [
+            ("s3 presigned", S3Boto3Storage(**storage_options())),
+            ("custom domain", S3Boto3Storage(**storage_options(custom_domain="cdn.example.net"))),
+            ("cdn cached", CDNStorage(**storage_options(custom_domain="cdn.example.net"))),
+        ]
+
+        self.stdout.write(f"{'backend':<16} {'urls/s':>12} {'us/url':>9}")
+        for label, storage in backends:
+            cdn_url.cache_clear()
+
+            started = time.perf_counter()
+            for name in names:
+                storage.url(name)
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(f"{label:<16} {len(names) / elapsed:>12,.0f} {elapsed / len(names) * 1e6:>9.2f}")
+
+        info = cdn_url.cache_info()
+        self.stdout.write(f"cdn cache: {info.hits} hits, {info.misses} misses")
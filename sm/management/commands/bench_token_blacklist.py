@@ -0,0 +1,130 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from sm.models import RevokedToken
+from sm.tokens import ExpiringBlacklistRefreshToken
+
+
+# the statements the token_blacklist app issues per token_refresh/ call, against tables
+# shaped like its OutstandingToken / BlacklistedToken models
+STOCK_SCHEMA = [
+    """
+    CREATE TEMP TABLE bench_outstandingtoken (
+        id integer PRIMARY KEY AUTOINCREMENT,
+        jti varchar(255) NOT NULL UNIQUE,
+        token text NOT NULL,
+        created_at datetime NULL,
+        expires_at datetime NOT NULL
+    )
+    """,
+    """
+    CREATE TEMP TABLE bench_blacklistedtoken (
+        id integer PRIMARY KEY AUTOINCREMENT,
+        token_id integer NOT NULL UNIQUE REFERENCES bench_outstandingtoken (id),
+        blacklisted_at datetime NOT NULL
+    )
+    """,
+]
+
+
+class Command(BaseCommand):
+    help = "Compare refresh-token rotation cost: RevokedToken blacklist vs the stock DB-table blacklist"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=5000, help="refreshes to simulate")
+        parser.add_argument("--preload", type=int, default=50000, help="rows already in either blacklist")
+
+    def handle(self, *args, **options):
+        count = options["tokens"]
+
+        revoked_us = self.bench_revoked(count, options["preload"])
+        stock_us, stock_rows = self.bench_stock(count, options["preload"])
+
+        self.stdout.write(f"{'backend':<16} {'us/refresh':>12} {'rows written':>13}")
+        self.stdout.write(f"{'revoked table':<16} {revoked_us:>12.1f} {count:>13}")
+        self.stdout.write(f"{'stock db table':<16} {stock_us:>12.1f} {stock_rows:>13}")
+        self.stdout.write(
+            "revoked rows are deleted by purge_revoked_tokens once their token expires; the "
+            "stock tables keep every row until flushexpiredtokens runs"
+        )
+
+    def bench_revoked(self, count, preload):
+        expires = timezone.now() + timedelta(days=1)
+        tokens = [ExpiringBlacklistRefreshToken() for _ in range(count)]
+
+        # same starting size as the stock tables, all rolled back afterwards
+        with transaction.atomic():
+            RevokedToken.objects.bulk_create(
+                [RevokedToken(jti=uuid.uuid4().hex, expires_at=expires) for _ in range(preload)],
+                batch_size=1000
+            )
+
+            started = time.perf_counter()
+            for token in tokens:
+                # what CustomTokenRefreshSerializer does: verify (blacklist check) then revoke
+                token.check_blacklist()
+                token.blacklist()
+            elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        return elapsed / count * 1e6
+
+    def bench_stock(self, count, preload):
+        expires = timezone.now() + timedelta(days=1)
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for statement in STOCK_SCHEMA:
+                    cursor.execute(statement)
+
+                cursor.executemany(
+                    "INSERT INTO bench_outstandingtoken (jti, token, created_at, expires_at) VALUES (%s, %s, %s, %s)",
+                    [(uuid.uuid4().hex, "x" * 200, timezone.now(), expires) for _ in range(preload)]
+                )
+
+                jtis = [uuid.uuid4().hex for _ in range(count)]
+                rows = 0
+
+                started = time.perf_counter()
+                for jti in jtis:
+                    # verify(): check_blacklist
+                    cursor.execute(
+                        "SELECT 1 FROM bench_blacklistedtoken b JOIN bench_outstandingtoken o "
+                        "ON b.token_id = o.id WHERE o.jti = %s LIMIT 1", [jti]
+                    )
+                    cursor.fetchone()
+
+                    # blacklist(): OutstandingToken.get_or_create + BlacklistedToken.get_or_create
+                    cursor.execute("SELECT id FROM bench_outstandingtoken WHERE jti = %s", [jti])
+                    if cursor.fetchone() is None:
+                        cursor.execute(
+                            "INSERT INTO bench_outstandingtoken (jti, token, created_at, expires_at) "
+                            "VALUES (%s, %s, %s, %s)", [jti, "x" * 200, timezone.now(), expires]
+                        )
+                        rows += 1
+                    outstanding_id = cursor.lastrowid
+                    cursor.execute("SELECT id FROM bench_blacklistedtoken WHERE token_id = %s", [outstanding_id])
+                    cursor.fetchone()
+                    cursor.execute(
+                        "INSERT INTO bench_blacklistedtoken (token_id, blacklisted_at) VALUES (%s, %s)",
+                        [outstanding_id, timezone.now()]
+                    )
+
+                    # outstand(): record the rotated replacement token
+                    cursor.execute(
+                        "INSERT INTO bench_outstandingtoken (jti, token, created_at, expires_at) "
+                        "VALUES (%s, %s, %s, %s)", [uuid.uuid4().hex, "x" * 200, timezone.now(), expires]
+                    )
+                    rows += 2
+                elapsed = time.perf_counter() - started
+
+                cursor.execute("DROP TABLE bench_blacklistedtoken")
+                cursor.execute("DROP TABLE bench_outstandingtoken")
+
+        return elapsed / count * 1e6, rows
@@ -0,0 +1,150 @@
+import heapq
+import posixpath
+from datetime import timedelta
+from itertools import groupby
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sm.models import CustomUser, MediaBlob, Post
+
+
+# S3 DeleteObjects takes at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+LIST_PAGE_SIZE = 1000
+REFERENCE_CHUNK_SIZE = 5000
+
+
+def list_bucket(storage):
+
+    # (name, last_modified) for every object under the storage location, in key order;
+    # S3 lists in UTF-8 byte order, which is also how Python compares str
+    prefix = storage.location.strip("/")
+    prefix = f"{prefix}/" if prefix else ""
+    pages = storage.bucket.objects.filter(Prefix=prefix).page_size(LIST_PAGE_SIZE)
+    for obj in pages:
+        yield obj.key[len(prefix):], obj.last_modified
+
+
+def list_directory(storage, path=""):
+
+    # the same listing for FileSystemStorage (tests, local dev); directories sort as
+    # "name/" so the recursive walk comes out in full-path order
+    directories, files = storage.listdir(path)
+    entries = [(name + "/", True) for name in directories] + [(name, False) for name in files]
+    for name, is_directory in sorted(entries):
+        full_name = posixpath.join(path, name.rstrip("/"))
+        if is_directory:
+            yield from list_directory(storage, full_name)
+        else:
+            yield full_name, storage.get_modified_time(full_name)
+
+
+def list_objects(storage):
+    if hasattr(storage, "bucket"):
+        return list_bucket(storage)
+    return list_directory(storage)
+
+
+def referenced_keys():
+
+    # every image key a row points at, sorted and de-duplicated; soft-deleted rows
+    # still count until purge_deleted has run
+    streams = [
+        model._base_manager
+        .exclude(**{field: ""})
+        .exclude(**{f"{field}__isnull": True})
+        .order_by(field)
+        .values_list(field, flat=True)
+        .iterator(chunk_size=REFERENCE_CHUNK_SIZE)
+        for model, field in ((Post, "gift_image"), (CustomUser, "profile_picture"))
+    ]
+    for key, _ in groupby(heapq.merge(*streams)):
+        yield key
+
+
+def orphans(objects, references):
+    """
+    Sort-merge walk of two key-ordered streams: yields (name, last_modified) for
+    objects no reference matches, holding one item of each stream in memory.
+    """
+    references = iter(references)
+    reference = next(references, None)
+
+    for name, modified in objects:
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name, modified
+
+
+def delete_keys(storage, names):
+    if hasattr(storage, "bucket"):
+        prefix = storage.location.strip("/")
+        storage.bucket.delete_objects(Delete={
+            "Objects": [{"Key": posixpath.join(prefix, name)} for name in names],
+            "Quiet": True
+        })
+    else:
+        for name in names:
+            storage.delete(name)
+    MediaBlob.objects.filter(key__in=names).delete()
+
+
+def recently_used(names, cutoff):
+    # keys store_blob reused after cutoff: the row pointing at one may not be committed yet,
+    # and the object itself keeps its old last_modified because reuse skips the PUT
+    return set(MediaBlob.objects.filter(key__in=names, used_at__gt=cutoff).values_list("key", flat=True))
+
+
+class Command(BaseCommand):
+    help = "Delete stored images that no Post or CustomUser references any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="keep unreferenced objects younger than this; uploads land before their row is saved"
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        dry_run = options["dry_run"]
+
+        self.deleted = 0
+        self.kept = 0
+        batch = []
+
+        for name, modified in orphans(list_objects(storage), referenced_keys()):
+            if timezone.is_naive(modified):
+                modified = timezone.make_aware(modified)
+            if modified > cutoff:
+                self.kept += 1
+                continue
+
+            batch.append(name)
+            if len(batch) >= DELETE_BATCH_SIZE:
+                self.flush(storage, batch, cutoff, dry_run)
+                batch = []
+
+        if batch:
+            self.flush(storage, batch, cutoff, dry_run)
+
+        verb = "would delete" if dry_run else "deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {self.deleted} unreferenced objects, kept {self.kept} inside the grace period"
+        ))
+
+    def flush(self, storage, names, cutoff, dry_run):
+        used = recently_used(names, cutoff)
+        names = [name for name in names if name not in used]
+        self.kept += len(used)
+        self.deleted += len(names)
+
+        if dry_run:
+            for name in names:
+                self.stdout.write(name)
+        elif names:
+            delete_keys(storage, names)
@@ -0,0 +1,285 @@
+import asyncio
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework_simplejwt.tokens import AccessToken
+
+from sm.models import CustomUser, Follow, Post, UserSearchPrefix, auth_user_cache, auth_user_cache_key
+
+
+DEFAULT_MIX = "feed=40,like=20,comment=10,follow=10,notifications=20"
+
+USERNAME_PREFIX = "loadtest_"
+
+# how the local server is started for --server; the module must be importable
+SERVERS = {
+    "runserver": (None, lambda host, port, workers: ["-m", "django", "runserver", "--noreload", f"{host}:{port}"]),
+    "wsgi": ("gunicorn", lambda host, port, workers: [
+        "-m", "gunicorn", "christmas_day.wsgi", "--bind", f"{host}:{port}", "--workers", str(workers)
+    ]),
+    "asgi": ("uvicorn", lambda host, port, workers: [
+        "-m", "uvicorn", "christmas_day.asgi:application", "--host", host, "--port", str(port),
+        "--workers", str(workers)
+    ]),
+}
+
+
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise CommandError(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+# each operation picks a request for one simulated user: (method, path, json body)
+def feed(state, user):
+    return "GET", f"/home/?filter={random.choice(('following', 'popular', 'all'))}", None
+
+def like(state, user):
+    return random.choice(("PUT", "DELETE")), f"/posts/like/{random.choice(state['post_ids'])}/", None
+
+def comment(state, user):
+    return "POST", f"/posts/{random.choice(state['post_ids'])}/comments/create/", {"text": "load test comment"}
+
+def follow(state, user):
+    target = random.choice([name for index, name in enumerate(state["usernames"]) if index != user])
+    return random.choice(("PUT", "DELETE")), f"/users/{target}/follow/", None
+
+def notifications(state, user):
+    return "GET", "/notifications/", None
+
+OPERATIONS = {
+    "feed": feed,
+    "like": like,
+    "comment": comment,
+    "follow": follow,
+    "notifications": notifications,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a mixed read/write workload against a local server and report throughput and latency. "
+        "Seeds loadtest_* accounts, posts and follows and keeps them (and the likes, comments and "
+        "follows the run writes) for the next run unless --cleanup is given, so point it at a scratch "
+        "database. SQLite lock errors are only told apart from other 5xx when the server runs with "
+        "DEBUG=True, since they are recognised in the debug error page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--server", choices=sorted(SERVERS),
+            help="start this server on --url for the run (wsgi needs gunicorn, asgi needs uvicorn)"
+        )
+        parser.add_argument("--workers", type=int, default=4, help="server worker processes for --server")
+        parser.add_argument("--concurrency", type=int, default=20, help="requests in flight")
+        parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+        parser.add_argument("--users", type=int, default=50, help="simulated accounts")
+        parser.add_argument("--posts-per-user", type=int, default=5)
+        parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight pairs")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--cleanup", action="store_true",
+            help="delete the loadtest_* accounts and everything they wrote once the run is over"
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        mix = parse_mix(options["mix"])
+        state = self.seed_data(options["users"], options["posts_per_user"], options["duration"])
+
+        server = None
+        if options["server"]:
+            server = self.start_server(options["server"], options["url"], options["workers"])
+
+        try:
+            started = time.perf_counter()
+            samples = asyncio.run(self.run(options["url"], state, mix, options["concurrency"], options["duration"]))
+            elapsed = time.perf_counter() - started
+            self.report(samples, elapsed, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            if options["cleanup"]:
+                self.cleanup()
+
+    def seed_data(self, user_count, posts_per_user, duration):
+
+        # idempotent: reuses loadtest_<n> accounts left by an earlier run
+        users = []
+        for index in range(user_count):
+            user, created = CustomUser.objects.get_or_create(
+                username=f"{USERNAME_PREFIX}{index}",
+                defaults={"first_name": "Load", "last_name": f"Test {index}", "is_phone_verified": True}
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=["password"])
+                Post.objects.bulk_create([
+                    Post(author=user, what=f"gift {number}", who="a friend", note="thank you!")
+                    for number in range(posts_per_user)
+                ])
+            users.append(user)
+
+        Follow.objects.bulk_create(
+            [
+                Follow(follower=user, following=other)
+                for user in users
+                for other in random.sample(users, min(10, len(users)))
+                if other.id != user.id
+            ],
+            ignore_conflicts=True
+        )
+        # bulk_create skips adjust_follower_count, resync the denormalized counts it maintains
+        for user in users:
+            UserSearchPrefix.objects.filter(user=user).update(follower_count=user.followers.count())
+
+        tokens = []
+        for user in users:
+            token = AccessToken.for_user(user)
+            # outlive the run, the default five minutes would turn a long test into 401s
+            token.set_exp(lifetime=timedelta(seconds=duration + 300))
+            tokens.append(str(token))
+
+        return {
+            "tokens": tokens,
+            "usernames": [user.username for user in users],
+            "post_ids": list(Post.objects.filter(author__in=users).values_list("id", flat=True)),
+        }
+
+    def cleanup(self):
+
+        # the workload only touches loadtest posts and accounts, so the cascade takes
+        # every like, comment, follow and notification the run wrote along with them
+        users = CustomUser.all_objects.filter(username__startswith=USERNAME_PREFIX)
+        user_ids = list(users.values_list("id", flat=True))
+        with transaction.atomic():
+            deleted, _ = users.delete()
+        auth_user_cache().delete_many([auth_user_cache_key(user_id) for user_id in user_ids])
+        self.stdout.write(f"cleanup: deleted {len(user_ids)} loadtest accounts ({deleted} rows)")
+
+    def start_server(self, kind, url, workers):
+        module, arguments = SERVERS[kind]
+        if module and importlib.util.find_spec(module) is None:
+            raise CommandError(f"--server {kind} needs {module} installed")
+
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        process = subprocess.Popen(
+            [sys.executable, *arguments(host, port, workers)],
+            env=os.environ.copy(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"{kind} server exited with status {process.returncode}")
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+
+        process.terminate()
+        raise CommandError(f"{kind} server did not start listening on {host}:{port}")
+
+    async def run(self, url, state, mix, concurrency, duration):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        samples = []
+        deadline = time.perf_counter() + duration
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with aiohttp.ClientSession(url, connector=connector, timeout=timeout) as session:
+
+            async def worker():
+                while time.perf_counter() < deadline:
+                    name = random.choices(names, weights)[0]
+                    user = random.randrange(len(state["tokens"]))
+                    method, path, body = OPERATIONS[name](state, user)
+                    headers = {"Authorization": f"Bearer {state['tokens'][user]}"}
+
+                    started = time.perf_counter()
+                    try:
+                        async with session.request(method, path, json=body, headers=headers) as response:
+                            content = await response.read()
+                            outcome = self.classify(response.status, content)
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        outcome = "connection"
+                    samples.append((name, (time.perf_counter() - started) * 1000, outcome))
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        return samples
+
+    def classify(self, status, content):
+        if status >= 500:
+            # only the DEBUG=True error page carries SQLite's message, a production 500 is bare
+            return "sqlite_locked" if b"database is locked" in content else "5xx"
+        if status == 429:
+            return "throttled"
+        if status >= 400:
+            return "4xx"
+        return "ok"
+
+    def report(self, samples, elapsed, options):
+        by_name = defaultdict(list)
+        outcomes = defaultdict(Counter)
+        for name, latency, outcome in samples:
+            by_name[name].append(latency)
+            outcomes[name][outcome] += 1
+
+        server = options["server"] or options["url"]
+        self.stdout.write(
+            f"server={server} concurrency={options['concurrency']} duration={elapsed:.1f}s "
+            f"requests={len(samples)} throughput={len(samples) / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f"{'operation':<14} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} "
+            f"{'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+        )
+
+        rows = sorted(by_name.items())
+        rows.append(("total", [latency for _, latency, _ in samples]))
+        outcomes["total"] = sum(outcomes.values(), Counter())
+
+        for name, latencies in rows:
+            ordered = sorted(latencies)
+            errors = sum(count for outcome, count in outcomes[name].items() if outcome != "ok")
+            error_rate = errors / len(ordered) if ordered else 0
+            self.stdout.write(
+                f"{name:<14} {len(ordered):>9} {len(ordered) / elapsed:>8.1f} {percentile(ordered, 50):>8.1f} "
+                f"{percentile(ordered, 90):>8.1f} {percentile(ordered, 99):>8.1f} "
+                f"{(ordered[-1] if ordered else 0):>8.1f} {error_rate:>7.2%}"
+            )
+
+        failures = {outcome: count for outcome, count in outcomes["total"].items() if outcome != "ok"}
+        if failures:
+            self.stdout.write("errors: " + ", ".join(f"{outcome}={count}" for outcome, count in sorted(failures.items())))
+            if "5xx" in failures:
+                self.stdout.write("5xx may include SQLite lock errors; run the server with DEBUG=True to count them as sqlite_locked")
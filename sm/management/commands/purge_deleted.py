@@ -0,0 +1,119 @@
+from collections import Counter
+
+from django.contrib.admin.models import LogEntry
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from sm.models import (
+    Comment,
+    CommentLike,
+    CustomUser,
+    Follow,
+    FollowSuggestion,
+    Notification,
+    Post,
+    PostLike,
+    Tombstone,
+    UserSearchPrefix,
+    auth_user_cache,
+    auth_user_cache_key
+)
+from sm.utils import delete_notifications, forget_following, record_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete soft-deleted posts and users with everything that hangs off them, in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.deleted = Counter()
+
+        self.purge_posts(Post.all_objects.filter(deleted_at__isnull=False))
+
+        while True:
+            user_ids = list(
+                CustomUser.all_objects.filter(deleted_at__isnull=False).values_list("id", flat=True)[:self.batch_size]
+            )
+            if not user_ids:
+                break
+            self.purge_users(user_ids)
+
+        summary = ", ".join(f"{count} {name}" for name, count in self.deleted.items()) or "nothing"
+        self.stdout.write(self.style.SUCCESS(f"purged {summary}"))
+
+    def drain(self, queryset, before=None):
+
+        # raw DELETE batch_size rows at a time, each batch in its own short write transaction,
+        # so the collector never loads the rows and the write lock is released between batches
+        model = queryset.model
+        while True:
+            ids = list(queryset.values_list("pk", flat=True)[:self.batch_size])
+            if not ids:
+                return
+            with transaction.atomic():
+                if before is not None:
+                    before(ids)
+                batch = model._base_manager.filter(pk__in=ids)
+                self.deleted[model._meta.verbose_name_plural] += batch._raw_delete(batch.db)
+
+    def drain_notifications(self, queryset):
+        # notifications are visible to sync/ clients, so they leave tombstones
+        while True:
+            ids = list(queryset.values_list("pk", flat=True)[:self.batch_size])
+            if not ids:
+                return
+            with transaction.atomic():
+                self.deleted["notifications"] += delete_notifications(Notification.objects.filter(pk__in=ids))
+
+    def purge_comments(self, queryset):
+        while True:
+            comment_ids = list(queryset.values_list("id", flat=True)[:self.batch_size])
+            if not comment_ids:
+                return
+            self.drain(CommentLike.objects.filter(comment_id__in=comment_ids))
+            self.drain_notifications(Notification.objects.filter(comment_id__in=comment_ids))
+            self.drain(
+                Comment.objects.filter(id__in=comment_ids),
+                before=lambda ids: record_tombstones("comment", ids)
+            )
+
+    def purge_posts(self, queryset):
+        while True:
+            post_ids = list(queryset.values_list("id", flat=True)[:self.batch_size])
+            if not post_ids:
+                return
+            self.purge_comments(Comment.objects.filter(post_id__in=post_ids))
+            self.drain_notifications(Notification.objects.filter(post_id__in=post_ids))
+            self.drain(PostLike.objects.filter(post_id__in=post_ids))
+            # their images stay until gc_media finds them unreferenced
+            self.drain(Post.all_objects.filter(id__in=post_ids))
+
+    def purge_users(self, user_ids):
+        self.purge_posts(Post.all_objects.filter(author_id__in=user_ids))
+        self.purge_comments(Comment.objects.filter(author_id__in=user_ids))
+
+        self.drain(PostLike.objects.filter(user_id__in=user_ids))
+        self.drain(CommentLike.objects.filter(user_id__in=user_ids))
+        self.drain_notifications(Notification.objects.filter(Q(sender_id__in=user_ids) | Q(recipient_id__in=user_ids)))
+
+        # soft_delete_user already took these out of the followed users' follower_count
+        self.drain(Follow.objects.filter(follower_id__in=user_ids))
+        # the remaining followers' cached sets still hold these users
+        self.drain(
+            Follow.objects.filter(following_id__in=user_ids),
+            before=lambda ids: forget_following(Follow.objects.filter(id__in=ids).values_list("follower_id", flat=True))
+        )
+        self.drain(FollowSuggestion.objects.filter(Q(user_id__in=user_ids) | Q(suggested_id__in=user_ids)))
+        self.drain(UserSearchPrefix.objects.filter(user_id__in=user_ids))
+        self.drain(Tombstone.objects.filter(user_id__in=user_ids))
+
+        self.drain(CustomUser.groups.through.objects.filter(customuser_id__in=user_ids))
+        self.drain(CustomUser.user_permissions.through.objects.filter(customuser_id__in=user_ids))
+        self.drain(LogEntry.objects.filter(user_id__in=user_ids))
+
+        self.drain(CustomUser.all_objects.filter(id__in=user_ids))
+        auth_user_cache().delete_many([auth_user_cache_key(user_id) for user_id in user_ids])
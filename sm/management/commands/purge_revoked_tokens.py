@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sm.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete blacklisted refresh-token JTIs whose token has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size = options["batch_size"]
+        total = 0
+
+        while True:
+            jtis = list(
+                RevokedToken.objects.filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("jti", flat=True)[:batch_size]
+            )
+            if not jtis:
+                break
+            total += RevokedToken.objects.filter(jti__in=jtis)._raw_delete(RevokedToken.objects.db)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} expired revoked tokens deleted"))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sm.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - settings.SYNC_TOMBSTONE_RETENTION
+        batch_size = options["batch_size"]
+        total = 0
+
+        while True:
+            ids = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff)
+                .order_by("deleted_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += Tombstone.objects.filter(id__in=ids)._raw_delete(Tombstone.objects.db)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} tombstones older than {cutoff:%Y-%m-%d} deleted"))
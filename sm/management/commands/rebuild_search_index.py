@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from sm.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild and optimize the FTS5 search index over posts and comments"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from sm.models import CustomUser, UserSearchPrefix
+
+
+class Command(BaseCommand):
+    help = "Rebuild the username / name prefix table used by users/search/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+
+        with transaction.atomic():
+            UserSearchPrefix.objects.all().delete()
+
+            rows = []
+            users = CustomUser.objects.annotate(
+                follower_total=Count("followers", filter=Q(followers__follower__deleted_at__isnull=True))
+            ).iterator(chunk_size=500)
+            for user in users:
+                rows.extend(
+                    UserSearchPrefix(prefix=prefix, user_id=user.id, follower_count=user.follower_total)
+                    for prefix in user.search_terms()
+                )
+                if len(rows) >= batch_size:
+                    UserSearchPrefix.objects.bulk_create(rows)
+                    total += len(rows)
+                    rows = []
+
+            UserSearchPrefix.objects.bulk_create(rows)
+            total += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} prefixes"))
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from sm.models import Comment, Post, PostLike, hot_score
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Post.hot_score for posts with likes, comments or edits in the last "
+        "--since-minutes. Removed likes and comments are only picked up by the next "
+        "activity on that post or by an --all run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since-minutes", type=int, default=15)
+        parser.add_argument("--all", action="store_true", help="rescore every post")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        if options["all"]:
+            post_ids = list(Post.objects.values_list("id", flat=True))
+        else:
+            since = timezone.now() - timedelta(minutes=options["since_minutes"])
+            post_ids = set(PostLike.objects.filter(created_at__gte=since).values_list("post_id", flat=True))
+            post_ids.update(Comment.objects.filter(created_at__gte=since).values_list("post_id", flat=True))
+            post_ids.update(Post.objects.filter(updated_at__gte=since).values_list("id", flat=True))
+            post_ids = sorted(post_ids)
+
+        for start in range(0, len(post_ids), batch_size):
+            self.rescore(post_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"Rescored {len(post_ids)} posts"))
+
+    def rescore(self, ids):
+        likes = dict(
+            PostLike.objects.filter(post_id__in=ids)
+            .values_list("post_id").annotate(total=Count("id")).order_by()
+        )
+        comments = dict(
+            Comment.objects.filter(post_id__in=ids)
+            .values_list("post_id").annotate(total=Count("id")).order_by()
+        )
+
+        posts = list(Post.objects.filter(id__in=ids).only("id", "created_at"))
+        for post in posts:
+            post.hot_score = hot_score(likes.get(post.id, 0), comments.get(post.id, 0), post.created_at)
+
+        # bulk_update leaves updated_at alone, rescoring is not an edit
+        Post.objects.bulk_update(posts, ["hot_score"])
@@ -0,0 +1,295 @@
+import cProfile
+import json
+import pstats
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedJWTAuthentication
+from .compression import COMPRESSIBLE_TYPES, acompress_sequence, cached_compress, compress, negotiate
+
+
+class QueryRecorder:
+    """Collects every SQL statement run while installed as a connection execute wrapper."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": self.alias,
+                "sql": sql,
+                "params": repr(params),
+                "time_ms": round((time.perf_counter() - start) * 1000, 3)
+            })
+
+
+class Profiling:
+    """cProfile over the calling thread plus a QueryRecorder on every connection."""
+
+    def __init__(self):
+        self.recorders = []
+        self.wrappers = []
+        self.profiler = cProfile.Profile()
+
+    def record_queries(self):
+        # connections are per thread, so this has to run on the thread doing the queries
+        for conn in connections.all():
+            recorder = QueryRecorder(conn.alias)
+            wrapper = conn.execute_wrapper(recorder)
+            wrapper.__enter__()
+            self.recorders.append(recorder)
+            self.wrappers.append(wrapper)
+
+    def stop_recording(self):
+        for wrapper in reversed(self.wrappers):
+            wrapper.__exit__(None, None, None)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    @property
+    def queries(self):
+        return [query for recorder in self.recorders for query in recorder.queries]
+
+
+class RequestProfilerMiddleware:
+    """
+    Staff-only, opt-in request profiling.
+
+    Send the ``X-Profile: 1`` header or the ``?profile=1`` query parameter as a staff
+    user and the view runs under cProfile. The normal body is replaced with a JSON
+    report holding the top functions, every SQL statement with its timing and any
+    duplicated queries. Everyone else gets the untouched response.
+
+    Under ASGI the SQL is recorded on the request's sync thread, where the async ORM
+    runs it, while cProfile only sees the event loop (and whatever else it ran).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profiling = Profiling()
+        profiling.record_queries()
+        profiling.start()
+        try:
+            response = self.get_response(request)
+            # streamed bodies do their queries while being consumed
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+        finally:
+            profiling.stop()
+            profiling.stop_recording()
+
+        return self.report(request, response, body, profiling)
+
+    async def __acall__(self, request):
+        if not self.profile_requested(request) or not await sync_to_async(self.is_staff)(request):
+            return await self.get_response(request)
+
+        profiling = Profiling()
+        await sync_to_async(profiling.record_queries)()
+        profiling.start()
+        try:
+            response = await self.get_response(request)
+            if not response.streaming:
+                body = response.content
+            elif response.is_async:
+                body = b"".join([chunk async for chunk in response.streaming_content])
+            else:
+                body = await sync_to_async(b"".join)(response.streaming_content)
+        finally:
+            profiling.stop()
+            await sync_to_async(profiling.stop_recording)()
+
+        return self.report(request, response, body, profiling)
+
+    def report(self, request, response, body, profiling):
+        queries = profiling.queries
+
+        report = {
+            "path": request.get_full_path(),
+            "method": request.method,
+            "status_code": response.status_code,
+            "total_time_ms": profiling.total_ms,
+            "functions": self.top_functions(profiling.profiler),
+            "sql": {
+                "count": len(queries),
+                "time_ms": round(sum(query["time_ms"] for query in queries), 3),
+                "duplicates": self.duplicates(queries, key=lambda q: (q["sql"], q["params"])),
+                "similar": self.duplicates(queries, key=lambda q: q["sql"]),
+                "queries": queries
+            },
+            "response": self.response_body(response, body)
+        }
+
+        return JsonResponse(report, json_dumps_params={"default": str})
+
+    def wants_profile(self, request):
+        return self.profile_requested(request) and self.is_staff(request)
+
+    def profile_requested(self, request):
+        if not getattr(settings, "REQUEST_PROFILING_ENABLED", False):
+            return False
+
+        flag = request.headers.get("X-Profile") or request.GET.get("profile")
+        return flag in ("1", "true", "yes")
+
+    def is_staff(self, request):
+        # admin session users are already on request.user, API users only carry a JWT
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+
+        return result is not None and result[0].is_staff
+
+    def top_functions(self, profiler):
+        limit = getattr(settings, "REQUEST_PROFILING_TOP_FUNCTIONS", 30)
+        stats = pstats.Stats(profiler).stats
+
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+
+        return [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": total_calls,
+                "primitive_calls": primitive_calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3)
+            }
+            for (filename, line, name), (primitive_calls, total_calls, tottime, cumtime, _) in rows
+        ]
+
+    def duplicates(self, queries, key):
+        counts = Counter(key(query) for query in queries)
+        dupes = []
+        for query_key, count in counts.most_common():
+            if count < 2:
+                break
+            sql = query_key[0] if isinstance(query_key, tuple) else query_key
+            dupes.append({"sql": sql, "count": count})
+        return dupes
+
+    def response_body(self, response, body):
+        if response.get("Content-Type", "").startswith("application/json"):
+            try:
+                return json.loads(body)
+            except ValueError:
+                pass
+
+        return None
+
+
+class CompressionMiddleware:
+    """
+    gzip / brotli response compression with a minimum size threshold.
+
+    Buffered responses of at least COMPRESSION_MIN_SIZE bytes are compressed with the
+    best encoding both sides support. Views that cache their body (my_progress,
+    search_users) hand over a CachedBody whose compressed bytes were built with the cache
+    entry; other identical GET bodies reuse theirs from the compression cache. Streamed
+    responses (the feeds, notifications) are per viewer and gzipped on the fly.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if response.has_header("Content-Encoding") or not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if response.streaming:
+            if negotiate(request.headers.get("Accept-Encoding"), ("gzip",)) is None:
+                return response
+            if response.is_async:
+                response.streaming_content = acompress_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers["Content-Length"]
+            self.finish(response, "gzip")
+            return response
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        cached_body = getattr(response, "cached_body", None)
+        if cached_body is not None:
+            compressed = cached_body.encoded.get(encoding)
+            if compressed is None:
+                return response
+        # only repeatable reads are worth remembering
+        elif request.method == "GET":
+            compressed = cached_compress(response.content, encoding)
+        else:
+            compressed = compress(response.content, encoding)
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        self.finish(response, encoding)
+        return response
+
+    def is_compressible(self, response):
+        content_type = response.get("Content-Type", "")
+        return response.status_code == 200 and content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def finish(self, response, encoding):
+        # the body changed, so a strong ETag would now be a lie
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
@@ -0,0 +1,80 @@
+# FTS5 full-text index over posts and comments (SQLite only)
+
+from django.db import migrations
+
+
+POST_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE sm_post_fts USING fts5(
+        what, who, note,
+        content='sm_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER sm_post_fts_ai AFTER INSERT ON sm_post BEGIN
+        INSERT INTO sm_post_fts(rowid, what, who, note) VALUES (new.id, new.what, new.who, new.note);
+    END
+    """,
+    """
+    CREATE TRIGGER sm_post_fts_ad AFTER DELETE ON sm_post BEGIN
+        INSERT INTO sm_post_fts(sm_post_fts, rowid, what, who, note) VALUES ('delete', old.id, old.what, old.who, old.note);
+    END
+    """,
+    """
+    CREATE TRIGGER sm_post_fts_au AFTER UPDATE OF what, who, note ON sm_post BEGIN
+        INSERT INTO sm_post_fts(sm_post_fts, rowid, what, who, note) VALUES ('delete', old.id, old.what, old.who, old.note);
+        INSERT INTO sm_post_fts(rowid, what, who, note) VALUES (new.id, new.what, new.who, new.note);
+    END
+    """,
+    "INSERT INTO sm_post_fts(sm_post_fts) VALUES ('rebuild')",
+]
+
+COMMENT_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE sm_comment_fts USING fts5(
+        text,
+        content='sm_comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER sm_comment_fts_ai AFTER INSERT ON sm_comment BEGIN
+        INSERT INTO sm_comment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER sm_comment_fts_ad AFTER DELETE ON sm_comment BEGIN
+        INSERT INTO sm_comment_fts(sm_comment_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER sm_comment_fts_au AFTER UPDATE OF text ON sm_comment BEGIN
+        INSERT INTO sm_comment_fts(sm_comment_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO sm_comment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    "INSERT INTO sm_comment_fts(sm_comment_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS sm_post_fts_ai",
+    "DROP TRIGGER IF EXISTS sm_post_fts_ad",
+    "DROP TRIGGER IF EXISTS sm_post_fts_au",
+    "DROP TABLE IF EXISTS sm_post_fts",
+    "DROP TRIGGER IF EXISTS sm_comment_fts_ai",
+    "DROP TRIGGER IF EXISTS sm_comment_fts_ad",
+    "DROP TRIGGER IF EXISTS sm_comment_fts_au",
+    "DROP TABLE IF EXISTS sm_comment_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0002_alter_customuser_email'),
+    ]
+
+    operations = [
+        migrations.RunSQL(POST_FTS_SQL + COMMENT_FTS_SQL, reverse_sql=DROP_SQL),
+    ]
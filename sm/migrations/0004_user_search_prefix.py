@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-19 13:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def index_existing_users(apps, schema_editor):
+    CustomUser = apps.get_model("sm", "CustomUser")
+    UserSearchPrefix = apps.get_model("sm", "UserSearchPrefix")
+
+    rows = []
+    users = CustomUser.objects.annotate(follower_total=Count("followers")).iterator(chunk_size=500)
+    for user in users:
+        prefixes = set()
+        for value in (user.username, user.first_name, user.last_name):
+            term = (value or "").strip().casefold()[:20]
+            prefixes.update(term[:end] for end in range(1, len(term) + 1))
+
+        rows.extend(
+            UserSearchPrefix(prefix=prefix, user_id=user.id, follower_count=user.follower_total)
+            for prefix in prefixes
+        )
+        if len(rows) >= 5000:
+            UserSearchPrefix.objects.bulk_create(rows)
+            rows = []
+
+    UserSearchPrefix.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchPrefix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20)),
+                ('follower_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_prefixes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['prefix', '-follower_count'], name='sm_usersear_prefix_709cc3_idx')],
+                'unique_together': {('prefix', 'user')},
+            },
+        ),
+        migrations.RunPython(index_existing_users, migrations.RunPython.noop),
+    ]
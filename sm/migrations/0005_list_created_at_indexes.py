@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0004_user_search_prefix'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', '-created_at'], name='sm_follow_followi_b9dfc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created_at'], name='sm_follow_followe_74c52e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['post', '-created_at'], name='sm_postlike_post_id_cdb864_idx'),
+        ),
+    ]
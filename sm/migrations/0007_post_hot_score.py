@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-19 13:04
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def score_existing_posts(apps, schema_editor):
+    Post = apps.get_model("sm", "Post")
+    PostLike = apps.get_model("sm", "PostLike")
+    Comment = apps.get_model("sm", "Comment")
+
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    likes = dict(PostLike.objects.values_list("post_id").annotate(total=Count("id")).order_by())
+    comments = dict(Comment.objects.values_list("post_id").annotate(total=Count("id")).order_by())
+
+    batch = []
+    for post in Post.objects.only("id", "created_at").iterator(chunk_size=1000):
+        points = likes.get(post.id, 0) + 2 * comments.get(post.id, 0)
+        post.hot_score = round(math.log10(max(points, 1)) + (post.created_at - epoch).total_seconds() / 45000, 7)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ["hot_score"])
+            batch = []
+
+    Post.objects.bulk_update(batch, ["hot_score"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0006_follow_suggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='sm_post_hot_sco_37f61c_idx'),
+        ),
+        migrations.RunPython(score_existing_posts, migrations.RunPython.noop),
+    ]
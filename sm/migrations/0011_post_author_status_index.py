@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0010_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['author', 'status'], name='sm_post_author_status_live'),
+        ),
+    ]
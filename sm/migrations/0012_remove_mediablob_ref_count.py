@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 14:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0011_post_author_status_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mediablob',
+            name='ref_count',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0012_remove_mediablob_ref_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
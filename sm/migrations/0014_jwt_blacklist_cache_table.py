@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 16:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # CACHES["tokens"] is a DatabaseCache; its table is not a model, so make sure it
+    # exists wherever the schema does
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0013_mediablob_used_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
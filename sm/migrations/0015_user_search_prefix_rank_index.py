@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0014_jwt_blacklist_cache_table'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usersearchprefix',
+            name='sm_usersear_prefix_709cc3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='usersearchprefix',
+            index=models.Index(fields=['prefix', '-follower_count', 'user'], name='sm_usersear_prefix_1927d8_idx'),
+        ),
+    ]
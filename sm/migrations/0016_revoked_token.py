@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sm', '0015_user_search_prefix_rank_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('jti', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        # the DatabaseCache table 0014 created for the old "tokens" cache alias
+        migrations.RunSQL("DROP TABLE IF EXISTS sm_jwt_blacklist", migrations.RunSQL.noop),
+    ]
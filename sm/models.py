@@ -1,11 +1,49 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.conf import settings
+from django.core.cache import cache, caches
 from PIL import Image
 from io import BytesIO
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.utils import timezone
+from django.db.models import Q
+from datetime import datetime, timezone as dt_timezone
+import hashlib
+import math
 import sys
 
+SEARCH_PREFIX_MAX_LENGTH = 20
+
+def auth_user_cache():
+    return caches[settings.AUTH_USER_CACHE]
+
+def auth_user_cache_key(user_id):
+    return f"auth_user:{user_id}"
+
+def progress_cache_key(user_id):
+    return f"post_progress:{user_id}"
+
+HOT_SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+def hot_score(like_count, comment_count, created_at):
+    # reddit-style: 10x the engagement is worth 12.5 hours of recency, and a post's
+    # score only changes when it gets activity, so old posts never need rescoring
+    points = like_count + 2 * comment_count
+    order = math.log10(max(points, 1))
+    seconds = (created_at - HOT_SCORE_EPOCH).total_seconds()
+    return round(order + seconds / 45000, 7)
+
+class LiveManagerMixin:
+    # soft-deleted rows stay in the table until purge_deleted runs, only all_objects sees them
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+class LiveUserManager(LiveManagerMixin, UserManager):
+    pass
+
+class LivePostManager(LiveManagerMixin, models.Manager):
+    pass
+
 def compress_image(image, max_size=(1920, 1080), quality=85):
     img = Image.open(image)
 
@@ -27,6 +65,49 @@ def compress_image(image, max_size=(1920, 1080), quality=85):
         None
     )
 
+def store_blob(field, file):
+
+    # identical bytes share one object: the key is the sha256 of the compressed image,
+    # so a repeat upload reuses the existing key and skips the PUT
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    digest = digest.hexdigest()
+
+    blob = MediaBlob.objects.filter(digest=digest).first()
+    if blob is None:
+        file.seek(0)
+        key = field.storage.save(f"{field.upload_to}{digest}.jpg", file)
+        # a concurrent upload of the same bytes may win, the object just written is then left to gc_media
+        blob, created = MediaBlob.objects.get_or_create(digest=digest, defaults={"key": key, "size": size})
+        if created:
+            return blob.key
+
+    # the object may be an old orphan: tell gc_media it is about to be referenced again
+    MediaBlob.objects.filter(pk=blob.pk).update(used_at=timezone.now())
+    return blob.key
+
+def store_image(instance, field_name, update_fields=None, **compress_options):
+    """
+    Compress and content-address a newly assigned image before instance is saved.
+
+    Objects no row points at any more are left for gc_media, which also removes their MediaBlob.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+
+    image = getattr(instance, field_name)
+    old_key = None
+    if instance.pk:
+        old_key = type(instance)._base_manager.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+
+    if image and image.name != old_key:
+        field = instance._meta.get_field(field_name)
+        setattr(instance, field_name, store_blob(field, compress_image(image, **compress_options)))
+
 class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     email = models.EmailField(blank=True)
@@ -34,25 +115,84 @@ class CustomUser(AbstractUser):
     is_phone_verified = models.BooleanField(default=False)
     phone_verification_code = models.CharField(max_length=6, blank=True, null=True)
     code_created_at = models.DateTimeField(blank=True, null=True)
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True, editable=False)
+
+    objects = LiveUserManager()
+    all_objects = UserManager()
 
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
-    def save(self, *args, **kwargs):
-        if self.profile_picture:
-            if self.pk:
-                old_instance = CustomUser.objects.filter(pk=self.pk).first()
-                is_new_image = old_instance is None or old_instance.profile_picture != self.profile_picture
-            else:
-                is_new_image = True
+    class Meta(AbstractUser.Meta):
+        # uniqueness checks and the admin must still see soft-deleted accounts
+        default_manager_name = "all_objects"
 
-            if is_new_image:
-                self.profile_picture = compress_image(self.profile_picture, max_size=(800, 800))
+    def save(self, *args, **kwargs):
+        store_image(self, "profile_picture", kwargs.get("update_fields"), max_size=(800, 800))
 
         super().save(*args, **kwargs)
 
+        # CachedJWTAuthentication must not keep serving the old row
+        auth_user_cache().delete(auth_user_cache_key(self.pk))
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"username", "first_name", "last_name"} & set(update_fields):
+            self.index_search_prefixes()
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        auth_user_cache().delete(auth_user_cache_key(user_id))
+        return result
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.is_active = False
+        CustomUser.all_objects.filter(pk=self.pk).update(deleted_at=self.deleted_at, is_active=False)
+        self.posts.update(deleted_at=self.deleted_at)
+        UserSearchPrefix.objects.filter(user=self).delete()
+        auth_user_cache().delete(auth_user_cache_key(self.pk))
+        cache.delete(progress_cache_key(self.pk))
+
+    def search_terms(self):
+        prefixes = set()
+        for value in (self.username, self.first_name, self.last_name):
+            term = (value or "").strip().casefold()[:SEARCH_PREFIX_MAX_LENGTH]
+            prefixes.update(term[:end] for end in range(1, len(term) + 1))
+        return prefixes
+
+    def index_search_prefixes(self):
+        wanted = self.search_terms()
+        existing = dict(
+            UserSearchPrefix.objects.filter(user=self).values_list("prefix", "follower_count")
+        )
+
+        if wanted == set(existing):
+            return
+
+        follower_count = next(iter(existing.values()), None)
+        if follower_count is None:
+            follower_count = self.followers.filter(follower__deleted_at__isnull=True).count()
+
+        UserSearchPrefix.objects.filter(user=self, prefix__in=set(existing) - wanted).delete()
+        UserSearchPrefix.objects.bulk_create([
+            UserSearchPrefix(prefix=prefix, user=self, follower_count=follower_count)
+            for prefix in wanted - set(existing)
+        ])
+
     def __str__(self):
         return self.username
 
+class UserSearchPrefix(models.Model):
+    prefix = models.CharField(max_length=SEARCH_PREFIX_MAX_LENGTH)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="search_prefixes")
+    follower_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("prefix", "user")
+        indexes = [
+            models.Index(fields=["prefix", "-follower_count", "user"]),
+        ]
+
 class Follow(models.Model):
 
     follower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="following")
@@ -61,11 +201,29 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ("follower", "following")
+        indexes = [
+            models.Index(fields=["following", "-created_at"]),
+            models.Index(fields=["follower", "-created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
 
 
+class FollowSuggestion(models.Model):
+    # precomputed by the build_follow_suggestions command
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="follow_suggestions")
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    mutual_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "suggested")
+        indexes = [
+            models.Index(fields=["user", "-mutual_count"]),
+        ]
+
+
 class Post(models.Model):
 
     status_enum = [
@@ -82,24 +240,52 @@ class Post(models.Model):
     status = models.CharField(max_length=20, choices=status_enum, default="not_started")
     created_at = models.DateTimeField(auto_now_add=True, null=False)
     updated_at = models.DateTimeField(auto_now=True, null=False)
+    hot_score = models.FloatField(null=True, blank=True, editable=False)
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True, editable=False)
+
+    objects = LivePostManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-hot_score", "-id"]),
+            models.Index(fields=["updated_at"]),
+            # covers me/progress/'s per-status counts, soft-deleted rows are left out
+            models.Index(
+                fields=["author", "status"],
+                condition=Q(deleted_at__isnull=True),
+                name="sm_post_author_status_live"
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.gift_image:
-            if self.pk:
-                old_instance = Post.objects.filter(pk=self.pk).first()
-                is_new_image = old_instance is None or old_instance.gift_image != self.gift_image
-            
-            else:
-                is_new_image = True
+        if self.hot_score is None:
+            self.hot_score = hot_score(0, 0, self.created_at or timezone.now())
 
-            if is_new_image:
-                self.gift_image = compress_image(self.gift_image)
+        store_image(self, "gift_image", kwargs.get("update_fields"))
 
         super().save(*args, **kwargs)
 
+        cache.delete(progress_cache_key(self.author_id))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(progress_cache_key(self.author_id))
+        return result
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        Post.all_objects.filter(pk=self.pk).update(deleted_at=self.deleted_at)
+        cache.delete(progress_cache_key(self.author_id))
+
+    def restore(self):
+        # a fresh updated_at so sync/ clients that already dropped it pick it up again
+        self.deleted_at = None
+        self.updated_at = timezone.now()
+        Post.all_objects.filter(pk=self.pk).update(deleted_at=None, updated_at=self.updated_at)
+        cache.delete(progress_cache_key(self.author_id))
+
     def __str__(self):
         return self.what
     
@@ -111,6 +297,9 @@ class PostLike(models.Model):
 
     class Meta:
         unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["post", "-created_at"]),
+        ]
 
 class Comment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="user_comments")
@@ -121,6 +310,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["updated_at"]),
+        ]
 
 class CommentLike(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -148,12 +340,55 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["recipient", "is_read"]),
+            models.Index(fields=["recipient", "updated_at"]),
         ]
 
     def __str__(self):
-        return f"{self.sender.username} -> {self.recipient.username}: {self.notification_type}"
\ No newline at end of file
+        return f"{self.sender.username} -> {self.recipient.username}: {self.notification_type}"
+
+
+class MediaBlob(models.Model):
+    # one stored image object, shared by every row whose compressed image has the same bytes
+    digest = models.CharField(max_length=64, unique=True)
+    key = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # last time store_blob handed out the key; gc_media keeps it for the grace period after
+    used_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.key
+
+
+class RevokedToken(models.Model):
+    # refresh tokens rotated out by ExpiringBlacklistRefreshToken; purge_revoked_tokens
+    # deletes rows once the token would have expired anyway
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class Tombstone(models.Model):
+    # deletions the sync/ endpoint has to report; purged after SYNC_TOMBSTONE_RETENTION
+    kinds_enum = [
+        ("post", "Post"),
+        ("comment", "Comment"),
+        ("notification", "Notification")
+    ]
+
+    kind = models.CharField(max_length=20, choices=kinds_enum)
+    object_id = models.BigIntegerField()
+    # only set for rows a single user can see (notifications), None means everyone
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at"]),
+            models.Index(fields=["user", "deleted_at"]),
+        ]
@@ -0,0 +1,105 @@
+import orjson
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# flush the streamed body in roughly this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# handles Decimal, lazy strings, querysets, ... the same way DRF's JSONRenderer does
+fallback_encoder = JSONEncoder()
+
+
+def dumps(data):
+    return orjson.dumps(data, default=fallback_encoder.default, option=ORJSON_OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class CachedBodyResponse(Response):
+
+    # sends a compression.CachedBody as is; CompressionMiddleware picks its
+    # precompressed bytes from response.cached_body
+    def __init__(self, body, **kwargs):
+        super().__init__(None, **kwargs)
+        self.cached_body = body
+        self["Content-Type"] = "application/json"
+
+    @property
+    def rendered_content(self):
+        return self.cached_body.content
+
+
+def json_list_head(envelope, key):
+    if envelope is None:
+        return b"["
+    head = dumps(envelope)[:-1]
+    head += b"," if len(head) > 1 else b""
+    return head + dumps(key) + b":["
+
+
+def stream_json_list(items, serialize=None, envelope=None, key=None):
+
+    # yields `[item, item, ...]` or `{...envelope, "key": [item, ...]}` one item at a
+    # time, so the full body never sits in memory; items without serialize are
+    # already plain data
+    buffer = bytearray(json_list_head(envelope, key))
+
+    first = True
+    for item in items:
+        if not first:
+            buffer += b","
+        buffer += dumps(serialize(item) if serialize else item)
+        first = False
+
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    buffer += b"]}" if envelope is not None else b"]"
+    yield bytes(buffer)
+
+
+def streaming_json_response(items, serialize=None, envelope=None, key=None):
+    return StreamingHttpResponse(
+        stream_json_list(items, serialize, envelope, key),
+        content_type="application/json"
+    )
+
+
+async def astream_json_list(items, envelope=None, key=None):
+
+    # stream_json_list over an async iterator of already serialized items, for the
+    # async views ASGI serves
+    buffer = bytearray(json_list_head(envelope, key))
+
+    first = True
+    async for item in items:
+        if not first:
+            buffer += b","
+        buffer += dumps(item)
+        first = False
+
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    buffer += b"]}" if envelope is not None else b"]"
+    yield bytes(buffer)
+
+
+def astreaming_json_response(items, envelope=None, key=None):
+    return StreamingHttpResponse(astream_json_list(items, envelope, key), content_type="application/json")
@@ -0,0 +1,99 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import SEARCH_PREFIX_MAX_LENGTH, UserSearchPrefix
+
+
+POST_FTS_TABLE = "sm_post_fts"
+COMMENT_FTS_TABLE = "sm_comment_fts"
+
+# column weights for bm25: what, who, note
+POST_WEIGHTS = (3.0, 2.0, 1.0)
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text):
+
+    # quote every term so user input never reaches FTS5 syntax; the last term
+    # is a prefix match so results show up while typing
+    terms = TERM_RE.findall(text or "")
+    if not terms:
+        return None
+
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_post_ids(text, limit, offset=0):
+
+    match = fts_query(text)
+    if match is None:
+        return []
+
+    weights = ", ".join(str(weight) for weight in POST_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {POST_FTS_TABLE} WHERE {POST_FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({POST_FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+            [match, limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_comment_ids(text, limit, offset=0):
+
+    match = fts_query(text)
+    if match is None:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {COMMENT_FTS_TABLE} WHERE {COMMENT_FTS_TABLE} MATCH %s "
+            f"ORDER BY rank LIMIT %s OFFSET %s",
+            [match, limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching_ids_sql(table, text):
+
+    # (sql, params) usable as a pk__in subquery, e.g. for admin search
+    return f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [fts_query(text)]
+
+
+def rebuild_index():
+
+    with connection.cursor() as cursor:
+        for table in (POST_FTS_TABLE, COMMENT_FTS_TABLE):
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+
+def search_user_ids(text, limit):
+
+    # exact lookup on the (prefix, -follower_count, user_id) index, already in rank order
+    term = (text or "").strip().casefold()
+    if not term:
+        return []
+
+    rows = UserSearchPrefix.objects.filter(prefix=term[:SEARCH_PREFIX_MAX_LENGTH])
+
+    if len(term) > SEARCH_PREFIX_MAX_LENGTH:
+        rows = rows.filter(
+            Q(user__username__istartswith=term) |
+            Q(user__first_name__istartswith=term) |
+            Q(user__last_name__istartswith=term)
+        )
+
+    return list(
+        rows.order_by("-follower_count", "user_id").values_list("user_id", flat=True)[:limit]
+    )
+
+
+def adjust_follower_count(user_id, delta):
+
+    UserSearchPrefix.objects.filter(user_id=user_id).update(follower_count=F("follower_count") + delta)
@@ -1,7 +1,60 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import CustomUser, Follow, Post, Comment, Notification
+from .tokens import ExpiringBlacklistRefreshToken
+from .models import CustomUser, FollowSuggestion, Post, Comment, Notification
+from .utils import following_ids
+
+
+def csv_param(params, name):
+    raw = params.get(name)
+    if raw is None:
+        return None
+    return {part.strip() for part in raw.split(",") if part.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets via ?fields=a,b and opt-in nesting via ?expand=author,comments.
+
+    Without either parameter the payload is unchanged. Once a client sends one of them,
+    fields outside ?fields= are dropped before serialization (so their method fields and
+    nested serializers never run), and nested objects listed in expandable_fields are
+    only rendered in full when named in ?expand=. Otherwise they collapse to their
+    primary key, or disappear when mapped to None.
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return
+
+        params = getattr(request, "query_params", request.GET)
+        only = csv_param(params, "fields")
+        expand = csv_param(params, "expand")
+
+        if only is None and expand is None:
+            return
+
+        expand = expand or set()
+        for name in list(self.fields):
+            if only is not None and name not in only and name not in expand:
+                self.fields.pop(name)
+            elif name in self.expandable_fields and name not in expand:
+                collapsed = self.expandable_fields[name]
+                if collapsed is None:
+                    self.fields.pop(name)
+                else:
+                    self.fields[name] = collapsed()
+
+
+def collapsed_pk():
+    return serializers.PrimaryKeyRelatedField(read_only=True)
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -39,6 +92,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ExpiringBlacklistRefreshToken
+
     def validate(self, attrs):
 
         data = super().validate(attrs)
@@ -51,7 +106,18 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         return token
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ExpiringBlacklistRefreshToken
+
+    def validate(self, attrs):
+        # the user lookup goes through the live manager, so a soft-deleted account's
+        # refresh token fails the way an inactive one does instead of raising DoesNotExist
+        try:
+            return super().validate(attrs)
+        except CustomUser.DoesNotExist:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     followers_count = serializers.SerializerMethodField()
     following_count = serializers.SerializerMethodField()
     is_following = serializers.SerializerMethodField()
@@ -71,19 +137,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "is_following"
         ]
     
+    # feed pages resolve these for all their users up front, see utils.user_stats
     def get_followers_count(self, obj):
-        return obj.followers.count()
+        if "follower_counts" in self.context:
+            return self.context["follower_counts"].get(obj.id, 0)
+        return obj.followers.filter(follower__deleted_at__isnull=True).count()
 
     def get_following_count(self, obj):
-        return obj.following.count()
+        if "following_counts" in self.context:
+            return self.context["following_counts"].get(obj.id, 0)
+        return obj.following.filter(following__deleted_at__isnull=True).count()
 
     def get_is_following(self, obj):
+        if "following_ids" in self.context:
+            return obj.id in self.context["following_ids"]
         request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return Follow.objects.filter(
-                follower=request.user,
-                following=obj
-            ).exists()
+        if request:
+            return obj.id in following_ids(request.user)
         return False
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -120,8 +190,37 @@ class SimpleAutoSerializer(serializers.ModelSerializer):
             "last_name"
         ]
 
-class CommentSerializer(serializers.ModelSerializer):
+class CompactUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    is_following = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CustomUser
+        fields = [
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "profile_picture",
+            "is_following"
+        ]
+
+    def get_is_following(self, obj):
+        # resolved for the whole page up front, see views.paginated_user_list
+        return obj.id in self.context.get("following_ids", ())
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    user = CompactUserSerializer(source="suggested", read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = [
+            "user",
+            "mutual_count"
+        ]
+
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
+    expandable_fields = {"author": collapsed_pk}
     like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
@@ -144,16 +243,21 @@ class CommentSerializer(serializers.ModelSerializer):
             "updated_at"
         ]
     
+    # like_total / viewer_liked come from utils.annotate_comments when present
     def get_like_count(self, obj):
-        return obj.likes.count()
+        if hasattr(obj, "like_total"):
+            return obj.like_total
+        return obj.likes.filter(user__deleted_at__isnull=True).count()
     
     def get_is_liked(self, obj):
+        if hasattr(obj, "viewer_liked"):
+            return obj.viewer_liked
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
     
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     author = UserProfileSerializer(read_only=True)
     like_count = serializers.SerializerMethodField()
@@ -161,6 +265,7 @@ class PostSerializer(serializers.ModelSerializer):
     is_liked = serializers.SerializerMethodField()
     comments = CommentSerializer(many=True, read_only=True)
     # note = serializers.SerializerMethodField()
+    expandable_fields = {"author": collapsed_pk, "comments": None}
 
     class Meta:
         model = Post
@@ -186,13 +291,20 @@ class PostSerializer(serializers.ModelSerializer):
             "updated_at"
         ]
     
+    # annotated by utils.annotate_posts when present
     def get_like_count(self, obj):
-        return obj.likes.count()
+        if hasattr(obj, "like_total"):
+            return obj.like_total
+        return obj.likes.filter(user__deleted_at__isnull=True).count()
     
     def get_comment_count(self, obj):
-        return obj.comments.count()
+        if hasattr(obj, "comment_total"):
+            return obj.comment_total
+        return obj.comments.filter(author__deleted_at__isnull=True).count()
     
     def get_is_liked(self, obj):
+        if hasattr(obj, "viewer_liked"):
+            return obj.viewer_liked
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
@@ -204,8 +316,23 @@ class PostSerializer(serializers.ModelSerializer):
             return obj.note
         return None
     
-class NotificationSerializer(serializers.ModelSerializer):
+# renders the .values() rows my_progress caches, timestamps in TIME_ZONE like the
+# other post serializers
+class ProgressItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Post
+        fields = [
+            "id",
+            "what",
+            "who",
+            "status",
+            "created_at",
+            "updated_at"
+        ]
+
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     sender = UserProfileSerializer(read_only=True)
+    expandable_fields = {"sender": collapsed_pk}
     post_preview = serializers.SerializerMethodField()
 
     class Meta:
@@ -223,7 +350,7 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     def get_post_preview(self, obj):
 
-        if obj.post:
+        if obj.post and obj.post.deleted_at is None:
             return {
                 "id": obj.post.id,
                 "what": obj.post.what
@@ -0,0 +1,34 @@
+from functools import lru_cache
+
+from django.core.exceptions import SuspiciousOperation
+from django.utils.encoding import filepath_to_uri
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name, safe_join
+
+
+# distinct object keys kept; a feed page repeats the same few hundred avatars
+URL_CACHE_SIZE = 50000
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def cdn_url(prefix, location, name):
+    try:
+        key = safe_join(location, clean_name(name))
+    except ValueError:
+        raise SuspiciousOperation(f"Attempted access to '{name}' denied.")
+    return prefix + filepath_to_uri(key)
+
+
+class CDNStorage(S3Boto3Storage):
+    """
+    S3 storage whose public URLs are built straight onto AWS_S3_CUSTOM_DOMAIN.
+
+    Unsigned CDN URLs only depend on the object key, so they are memoized per key.
+    Anything that needs signing or extra parameters still goes through S3Boto3Storage.
+    """
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if parameters or http_method or not self.custom_domain or (self.querystring_auth and self.cloudfront_signer):
+            return super().url(name, parameters, expire, http_method)
+
+        return cdn_url(f"{self.url_protocol}//{self.custom_domain}/", self.location, name)
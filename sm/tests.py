@@ -1,3 +1,563 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from sm.admin import PostAdmin
+from sm.management.commands.loadtest import Command as LoadtestCommand
+from sm.models import Comment, CustomUser, Follow, MediaBlob, Notification, Post, PostLike, RevokedToken, Tombstone, UserSearchPrefix, auth_user_cache
+from sm.search import adjust_follower_count
+from sm.serializers import PostSerializer
+from sm.tokens import ExpiringBlacklistRefreshToken
+from sm.utils import soft_delete_post, soft_delete_user
+from sm.views import sync_token
+
+
+def make_user(username):
+    return CustomUser.objects.create(username=username, first_name=username.title())
+
+
+def follow(follower, following):
+    # what follow_unfollow does, keeping the search follower_count in step
+    Follow.objects.create(follower=follower, following=following)
+    adjust_follower_count(following.id, 1)
+
+
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+
+    def token(self, moment):
+        return sync_token([(moment, 0)] * 4)
+
+    def test_page_boundary_inside_equal_timestamps(self):
+        posts = [Post.objects.create(author=self.user, what=f"gift {n}", who="grandma") for n in range(5)]
+        moment = timezone.now() - timedelta(hours=1)
+        Post.objects.update(updated_at=moment)
+
+        seen = []
+        since = self.token(moment - timedelta(seconds=1))
+        with mock.patch("sm.views.SYNC_PAGE_SIZE", 2):
+            for _ in range(5):
+                data = self.client.get("/sync/", {"since": since}).json()
+                seen += [post["id"] for post in data["posts"]]
+                since = data["next"]
+                if not data["has_more"]:
+                    break
+
+        self.assertFalse(data["has_more"])
+        self.assertEqual(seen, [post.id for post in posts])
+
+    def test_deleted_post_comes_back_as_tombstone(self):
+        post = Post.objects.create(author=self.user, what="socks", who="grandma")
+        since = self.client.get("/sync/").json()["next"]
+
+        self.assertEqual(self.client.delete(f"/posts/delete/{post.id}/").status_code, 204)
+
+        data = self.client.get("/sync/", {"since": since}).json()
+        self.assertEqual(data["deleted"]["posts"], [post.id])
+        self.assertEqual(data["posts"], [])
+
+    def test_expired_token(self):
+        response = self.client.get("/sync/", {"since": self.token(timezone.now() - timedelta(days=365))})
+        self.assertEqual(response.status_code, 410)
+
+    def test_malformed_token(self):
+        for since in ("abc", "1-2", "99999999999999999999999", f"{int(time.time() * 1e6)}.{2 ** 63}"):
+            self.assertEqual(self.client.get("/sync/", {"since": since}).status_code, 400)
+
+
+class ToggleTests(APITestCase):
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.post = Post.objects.create(author=self.bob, what="socks", who="grandma")
+        self.client.force_authenticate(self.alice)
+
+    def notifications(self, notification_type):
+        return Notification.objects.filter(recipient=self.bob, sender=self.alice, notification_type=notification_type)
+
+    def test_like_put_is_idempotent_and_delete_removes_notification(self):
+        url = f"/posts/like/{self.post.id}/"
+
+        self.assertEqual(self.client.put(url).status_code, 201)
+        response = self.client.put(url)
+        self.assertEqual((response.status_code, response.json()), (200, {"liked": True}))
+        self.assertEqual(PostLike.objects.count(), 1)
+        self.assertEqual(self.notifications("like_post").count(), 1)
+
+        self.assertEqual(self.client.delete(url).json(), {"liked": False})
+        self.assertEqual(self.client.delete(url).json(), {"liked": False})
+        self.assertFalse(PostLike.objects.exists())
+        self.assertFalse(self.notifications("like_post").exists())
+
+    def test_follow_post_flips_with_one_notification_per_follow(self):
+        url = f"/users/{self.bob.username}/follow/"
+
+        self.assertEqual(self.client.post(url).json(), {"following": True})
+        self.assertEqual(self.client.post(url).json(), {"following": False})
+        self.assertEqual(self.client.put(url).status_code, 201)
+        self.assertEqual(self.client.put(url).status_code, 200)
+
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.notifications("follow").count(), 1)
+        self.assertEqual(set(UserSearchPrefix.objects.filter(user=self.bob).values_list("follower_count", flat=True)), {1})
+
+
+class BatchTests(APITestCase):
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.post = Post.objects.create(author=self.bob, what="socks", who="grandma")
+        self.client.force_authenticate(self.alice)
+
+    def batch(self, *operations):
+        response = self.client.post("/batch/", {"operations": list(operations)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_each_op_sees_the_ones_before_it_and_only_the_net_change_is_written(self):
+        results = self.batch(
+            {"op": "like_post", "id": self.post.id},
+            {"op": "like_post", "id": self.post.id},
+            {"op": "unlike_post", "id": self.post.id},
+            {"op": "follow", "username": "bob"},
+            {"op": "unfollow", "username": "bob"},
+            {"op": "follow", "username": "bob"},
+        )
+
+        self.assertEqual([result["status"] for result in results], [201, 200, 200, 201, 200, 201])
+        self.assertEqual([result.get("liked", result.get("following")) for result in results],
+                         [True, True, False, True, False, True])
+
+        self.assertFalse(PostLike.objects.exists())
+        self.assertFalse(Notification.objects.filter(notification_type="like_post").exists())
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(notification_type="follow").count(), 1)
+        self.assertEqual(set(UserSearchPrefix.objects.filter(user=self.bob).values_list("follower_count", flat=True)), {1})
+
+    def test_bad_ops_fail_alone(self):
+        results = self.batch(
+            {"op": "like_post", "id": 2 ** 63},
+            {"op": "like_post", "id": self.post.id + 1},
+            {"op": "follow", "username": "alice"},
+            {"op": "like_post", "id": self.post.id},
+        )
+
+        self.assertEqual([result["status"] for result in results], [400, 404, 400, 201])
+        self.assertEqual(PostLike.objects.count(), 1)
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.client.force_authenticate(self.alice)
+
+    def add_posts(self, count):
+        for n in range(count):
+            author = make_user(f"author{Post.objects.count()}")
+            post = Post.objects.create(author=author, what="woolly socks", who="grandma")
+            Comment.objects.create(author=make_user(f"commenter{post.id}"), post=post, text="woolly indeed")
+
+    def queries(self, search_type):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/search/", {"q": "woolly", "type": search_type})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()["results"]
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.add_posts(2)
+        few = {search_type: self.queries(search_type)[0] for search_type in ("posts", "comments")}
+
+        self.add_posts(6)
+        for search_type in ("posts", "comments"):
+            count, results = self.queries(search_type)
+            self.assertEqual(len(results), 8)
+            self.assertEqual(count, few[search_type])
+
+        post = self.queries("posts")[1][0]
+        self.assertEqual((post["comment_count"], len(post["comments"])), (1, 1))
+        self.assertEqual(post["author"]["followers_count"], 0)
+
+
+class LikeStateTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(make_user("alice"))
+
+    def test_rejects_ids_outside_the_id_range(self):
+        for posts in ("99999999999999999999999", str(2 ** 63), "-1", "0", "1,x"):
+            self.assertEqual(self.client.get("/likes/state/", {"posts": posts}).status_code, 400)
+
+        self.assertEqual(self.client.get("/likes/state/", {"posts": str(2 ** 63 - 1)}).status_code, 200)
+
+
+class ProgressTests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+        for n in range(8):
+            Post.objects.create(author=self.user, what=f"a very long woolly scarf number {n}", who="grandma")
+
+    def test_cache_hit_sends_the_stored_compressed_body(self):
+        first = self.client.get("/me/progress/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(first["Content-Encoding"], "gzip")
+
+        with mock.patch("sm.compression.compress") as compress, mock.patch("sm.views.CachedBody") as cached_body:
+            second = self.client.get("/me/progress/", HTTP_ACCEPT_ENCODING="gzip")
+        compress.assert_not_called()
+        cached_body.assert_not_called()
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(json.loads(gzip.decompress(second.content))["total"], 8)
+
+        plain = self.client.get("/me/progress/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(plain.json()["total"], 8)
+
+        # a new post drops the entry, compressed bytes and all
+        Post.objects.create(author=self.user, what="mittens", who="grandpa")
+        third = self.client.get("/me/progress/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(json.loads(gzip.decompress(third.content))["total"], 9)
+
+    def test_timestamps_match_the_post_serializer(self):
+        post = Post.objects.latest("id")
+        item = self.client.get("/me/progress/").json()["recent"][0]
+
+        rendered = PostSerializer(post).data
+        self.assertEqual(item["id"], post.id)
+        self.assertEqual((item["created_at"], item["updated_at"]), (rendered["created_at"], rendered["updated_at"]))
+        self.assertFalse(item["created_at"].endswith(("+00:00", "Z")))
+
+
+class CachedAuthUserTests(APITestCase):
+
+    def setUp(self):
+        auth_user_cache().clear()
+        self.user = make_user("alice")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        # fills the cached copy
+        self.assertEqual(self.client.get("/my_profile/").status_code, 200)
+
+    def test_write_through_stale_cached_user_does_not_resurrect_the_row(self):
+        # what another worker's deactivation looks like before this cache entry expires
+        CustomUser.all_objects.filter(id=self.user.id).update(is_active=False, deleted_at=timezone.now())
+
+        self.assertEqual(self.client.put("/update_user/", {"bio": "hi"}).status_code, 401)
+
+        row = CustomUser.all_objects.get(id=self.user.id)
+        self.assertEqual((row.is_active, row.bio), (False, None))
+        self.assertIsNotNone(row.deleted_at)
+
+    def test_soft_delete_drops_the_shared_entry(self):
+        soft_delete_user(CustomUser.objects.get(id=self.user.id))
+
+        self.assertEqual(self.client.get("/my_profile/").status_code, 401)
+
+
+class TokenBlacklistTests(APITestCase):
+
+    def test_rotated_refresh_token_cannot_be_replayed(self):
+        refresh = str(ExpiringBlacklistRefreshToken.for_user(make_user("alice")))
+
+        self.assertEqual(self.client.post("/token_refresh/", {"refresh": refresh}).status_code, 200)
+        # the revocation is a row every worker can see, not a per-process cache entry
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        self.assertEqual(self.client.post("/token_refresh/", {"refresh": refresh}).status_code, 401)
+
+    def test_purge_drops_only_expired_rows(self):
+        RevokedToken.objects.create(jti="old", expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti="live", expires_at=timezone.now() + timedelta(days=1))
+
+        call_command("purge_revoked_tokens", stdout=StringIO())
+
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+
+
+@override_settings(ROOT_URLCONF="christmas_day.asgi_urls")
+class AsyncViewTests(APITestCase):
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create(username="alice", first_name="Alice", is_staff=True)
+        self.bob = make_user("bob")
+        self.post = Post.objects.create(author=self.bob, what="socks", who="grandma")
+        Comment.objects.create(author=self.alice, post=self.post, text="lovely")
+        Notification.objects.create(recipient=self.alice, sender=self.bob, notification_type="follow")
+        self.client = AsyncClient()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.alice)}"}
+
+    def get(self, path, data=None):
+        return self.client.get(path, data, headers=self.headers)
+
+    async def body(self, response):
+        self.assertTrue(response.is_async)
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    async def test_home_feed_streams_from_the_async_view(self):
+        response = await self.get("/home/")
+        self.assertEqual(response.status_code, 200)
+
+        body = await self.body(response)
+        self.assertIn(f'"id":{self.post.id}'.encode(), body)
+        self.assertIn(b'"comment_count":1', body)
+
+    async def test_profile_and_notifications(self):
+        profile = await self.get(f"/profile/{self.bob.username}/")
+        self.assertEqual((profile.json()["post_count"], len(profile.json()["posts"])), (1, 1))
+        self.assertEqual((await self.get("/profile/nobody/")).status_code, 404)
+
+        body = await self.body(await self.get("/notifications/"))
+        self.assertTrue(body.startswith(b'{"unread_count":1,"notifications":[{'))
+
+    async def test_drf_authentication_and_method_checks_still_apply(self):
+        self.assertEqual((await AsyncClient().get("/home/")).status_code, 401)
+        self.assertEqual((await self.client.post("/home/", headers=self.headers)).status_code, 405)
+
+    @override_settings(REQUEST_PROFILING_ENABLED=True)
+    async def test_profiler_records_async_orm_queries(self):
+        report = (await self.get("/home/", {"profile": "1"})).json()
+        self.assertGreater(report["sql"]["count"], 0)
+        self.assertEqual(report["response"][0]["id"], self.post.id)
+
+
+class SoftDeleteTests(APITestCase):
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.post = Post.objects.create(author=self.alice, what="socks", who="grandma")
+        self.client.force_authenticate(self.alice)
+
+    def test_deleted_user_is_hidden_and_uncounted(self):
+        follow(self.bob, self.alice)
+        PostLike.objects.create(user=self.bob, post=self.post)
+
+        soft_delete_user(self.bob)
+
+        followers = self.client.get(f"/users/{self.alice.username}/followers/").json()
+        self.assertEqual(followers["followers"], [])
+        self.assertEqual(self.client.get(f"/posts/{self.post.id}/likes/").json()["likes"], [])
+
+        profile = self.client.get(f"/profile/{self.alice.username}/").json()
+        self.assertEqual(profile["follower_count"], 0)
+        self.assertEqual(profile["posts"][0]["like_count"], 0)
+        self.assertEqual(set(UserSearchPrefix.objects.filter(user=self.alice).values_list("follower_count", flat=True)), {0})
+
+        self.assertEqual(self.client.get(f"/profile/{self.bob.username}/").status_code, 404)
+
+    def test_deleted_user_comments_and_follows_are_uncounted(self):
+        follow(self.bob, self.alice)
+        Comment.objects.create(author=self.bob, post=self.post, text="lovely")
+
+        soft_delete_user(self.bob)
+
+        post = self.client.get(f"/profile/{self.alice.username}/", {"expand": "comments"}).json()["posts"][0]
+        self.assertEqual((post["comment_count"], post["comments"]), (0, []))
+
+        post = self.client.put(f"/posts/update/{self.post.id}/?expand=comments", {"note": "wool"}).json()
+        self.assertEqual((post["comment_count"], post["comments"]), (0, []))
+
+        call_command("rebuild_user_search", stdout=open(os.devnull, "w"))
+        self.assertEqual(set(UserSearchPrefix.objects.filter(user=self.alice).values_list("follower_count", flat=True)), {0})
+
+        UserSearchPrefix.objects.filter(user=self.alice).delete()
+        self.alice.index_search_prefixes()
+        self.assertEqual(set(UserSearchPrefix.objects.filter(user=self.alice).values_list("follower_count", flat=True)), {0})
+
+    def test_deleted_post_is_hidden(self):
+        notification = Notification.objects.create(
+            recipient=self.alice, sender=self.bob, notification_type="like_post", post=self.post
+        )
+        soft_delete_post(self.post)
+
+        self.assertEqual(b"".join(self.client.get("/home/").streaming_content), b"[]")
+
+        notifications = b"".join(self.client.get("/notifications/").streaming_content)
+        self.assertIn(f'"id":{notification.id}'.encode(), notifications)
+        self.assertIn(b'"post_preview":null', notifications)
+
+    def test_deleted_user_cannot_refresh(self):
+        refresh = str(ExpiringBlacklistRefreshToken.for_user(self.alice))
+
+        self.assertEqual(self.client.delete("/delete_user/").status_code, 204)
+
+        response = self.client.post("/token_refresh/", {"refresh": refresh})
+        self.assertEqual((response.status_code, response.json()["code"]), (401, "no_active_account"))
+
+    def test_purge_removes_dependents(self):
+        Comment.objects.create(author=self.bob, post=self.post, text="lovely")
+        PostLike.objects.create(user=self.bob, post=self.post)
+        follow(self.bob, self.alice)
+
+        soft_delete_user(self.bob)
+        soft_delete_post(self.post)
+        call_command("purge_deleted", stdout=open(os.devnull, "w"))
+
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
+        self.assertFalse(CustomUser.all_objects.filter(id=self.bob.id).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(PostLike.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(CustomUser.objects.filter(id=self.alice.id).exists())
+
+
+class PostAdminTests(APITestCase):
+
+    def setUp(self):
+        self.staff = CustomUser.objects.create(username="alice", is_staff=True, is_superuser=True)
+        self.client.force_login(self.staff)
+        self.post = Post.objects.create(author=self.staff, what="socks", who="grandma")
+
+    def test_no_hard_delete_action(self):
+        response = self.client.get("/admin/sm/post/")
+        actions = [name for name, _ in response.context["action_form"].fields["action"].choices]
+        self.assertNotIn("delete_selected", actions)
+        self.assertEqual(self.client.get(f"/admin/sm/post/{self.post.id}/delete/").status_code, 403)
+
+    def test_soft_deleted_posts_are_listed_and_restorable(self):
+        soft_delete_post(self.post)
+
+        response = self.client.get("/admin/sm/post/", {"deleted_at__isnull": "False"})
+        self.assertEqual([post.id for post in response.context["cl"].result_list], [self.post.id])
+
+        self.client.post("/admin/sm/post/", {"action": "restore_selected", "_selected_action": [self.post.id]})
+
+        self.assertTrue(Post.objects.filter(id=self.post.id).exists())
+        self.assertFalse(Tombstone.objects.filter(kind="post", object_id=self.post.id).exists())
+
+    def test_filtered_list_pages_past_the_count_limit(self):
+        for n in range(4):
+            Post.objects.create(author=self.staff, what=f"gift {n}", who="grandma")
+
+        with mock.patch("sm.admin.ESTIMATED_COUNT_LIMIT", 1), mock.patch.object(PostAdmin, "list_per_page", 1):
+            response = self.client.get("/admin/sm/post/", {"status__exact": "not_started", "p": 4})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 1)
+        self.assertTrue(response.context["cl"].paginator.page(4).has_next())
+
+
+def use_temp_media(test):
+    media_root = tempfile.TemporaryDirectory()
+    test.addCleanup(media_root.cleanup)
+    storage = override_settings(
+        STORAGES={"default": {"BACKEND": "django.core.files.storage.FileSystemStorage"}},
+        MEDIA_ROOT=media_root.name
+    )
+    storage.enable()
+    test.addCleanup(storage.disable)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+
+    def test_archive_holds_each_shared_image_once(self):
+        name = default_storage.save("blog_img/digest.jpg", ContentFile(b"jpeg"))
+        for what in ("socks", "scarf"):
+            Post.objects.create(author=self.user, what=what, who="grandma")
+        Post.objects.update(gift_image=name)
+
+        response = self.client.get("/export/archive/")
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+        self.assertEqual(archive.namelist(), ["export.ndjson", f"images/{name}"])
+
+
+class GcMediaTests(APITestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.author = make_user("alice")
+
+    def store(self, name, age=timedelta(days=2)):
+        name = default_storage.save(name, ContentFile(b"jpeg"))
+        modified = time.time() - age.total_seconds()
+        os.utime(default_storage.path(name), (modified, modified))
+        MediaBlob.objects.create(digest=name, key=name, size=4, used_at=timezone.now() - age)
+        return name
+
+    def gc(self, *args):
+        call_command("gc_media", *args, stdout=StringIO())
+
+    def test_deletes_only_old_unreferenced_objects(self):
+        referenced = self.store("blog_img/referenced.jpg")
+        Post.objects.create(author=self.author, what="socks", who="grandma")
+        Post.objects.update(gift_image=referenced)
+        orphan = self.store("blog_img/orphan.jpg")
+        fresh = self.store("blog_img/fresh.jpg", age=timedelta(minutes=5))
+        avatar = self.store("profile_pic/avatar.jpg")
+        CustomUser.objects.filter(id=self.author.id).update(profile_picture=avatar)
+
+        self.gc()
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(MediaBlob.objects.filter(key=orphan).exists())
+        for name in (referenced, fresh, avatar):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_keeps_old_object_store_blob_just_reused(self):
+        reused = self.store("blog_img/reused.jpg")
+        MediaBlob.objects.filter(key=reused).update(used_at=timezone.now())
+
+        self.gc()
+
+        self.assertTrue(default_storage.exists(reused))
+
+    def test_dry_run_deletes_nothing(self):
+        orphan = self.store("blog_img/orphan.jpg")
+
+        self.gc("--dry-run")
+
+        self.assertTrue(default_storage.exists(orphan))
+        self.assertTrue(MediaBlob.objects.filter(key=orphan).exists())
+
+
+class LoadtestTests(APITestCase):
+
+    def test_cleanup_removes_everything_the_run_wrote(self):
+        alice = make_user("alice")
+
+        seed_data = LoadtestCommand.seed_data
+
+        def seed_and_comment(command, *args):
+            # what a run leaves behind on top of the seeded rows
+            state = seed_data(command, *args)
+            user = CustomUser.objects.get(username="loadtest_0")
+            Comment.objects.create(author=user, post_id=state["post_ids"][-1], text="load test comment")
+            return state
+
+        async def run(command, *args):
+            return []
+
+        with mock.patch.object(LoadtestCommand, "seed_data", seed_and_comment), mock.patch.object(LoadtestCommand, "run", run):
+            call_command("loadtest", "--users", "3", "--duration", "0", "--cleanup", stdout=StringIO())
+
+        self.assertEqual(list(CustomUser.all_objects.all()), [alice])
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .models import RevokedToken
+from .utils import insert_ignore
+
+
+def is_revoked(jti):
+
+    # a bare primary key probe; the ORM's query building costs far more than the lookup
+    table = connection.ops.quote_name(RevokedToken._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {table} WHERE jti = %s LIMIT 1", [jti])
+        return cursor.fetchone() is not None
+
+
+class ExpiringBlacklistRefreshToken(RefreshToken):
+    """
+    RefreshToken whose blacklist is a single RevokedToken table instead of the
+    token_blacklist app's OutstandingToken / BlacklistedToken pair.
+
+    Only revoked JTIs are stored, keyed by the JTI itself, so checking is one primary
+    key lookup and revoking one insert. Each row carries the token's expiry, and
+    purge_revoked_tokens deletes them once the token could not be used anyway, which
+    keeps the table at roughly the number of live rotated-out tokens. Being a table,
+    a revocation is seen by every worker and survives restarts.
+    """
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if is_revoked(jti):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        expires_at = datetime_from_epoch(self.payload["exp"])
+
+        if expires_at > aware_utcnow():
+            insert_ignore(RevokedToken, jti=jti, expires_at=expires_at)
@@ -10,7 +10,9 @@ urlpatterns = [
     path("", views.home_feed, name="home"),
     path("register_user/", views.register_user, name="register_user"),
     path("update_user/", views.update_user, name="update_user"),
+    path("delete_user/", views.delete_user, name="delete_user"),
     path("my_profile/", views.get_current_user, name="profile"),
+    path("me/progress/", views.my_progress, name="my_progress"),
     path("profile/<str:username>/", views.user_profile, name="other_user_profile"),
     path("verify_phone/send/", views.send_phone_verification, name="send_phone_verification"),
     path("verify_phone/confirm/", views.verify_phone, name="verify_phone"),
@@ -28,8 +30,11 @@ urlpatterns = [
     path("comments/<int:pk>/update/", views.update_comment, name="update_comment"),
     path("comments/<int:pk>/delete/", views.delete_comment, name="delete_comment"),
     path("comments/<int:pk>/like/", views.like_unlike_comment, name="like_unlike_comment"),
+    path("likes/state/", views.like_states, name="like_states"),
 
     # follow
+    path("users/search/", views.search_users, name="search_users"),
+    path("users/suggestions/", views.follow_suggestions, name="follow_suggestions"),
     path("users/<str:username>/follow/", views.follow_unfollow, name="follow_unfollow"),
     path("users/<str:username>/followers/", views.see_user_followers, name="see_user_followers"),
     path("users/<str:username>/following/", views.see_user_following, name="see_user_following"),
@@ -39,6 +44,19 @@ urlpatterns = [
     path("notifications/<int:pk>/read/", views.mark_notification_read, name="mark_notification_read"),
     path("notifications/<int:pk>/delete/", views.delete_notification, name="delete_notification"),
 
+    # batched writes
+    path("batch/", views.batch, name="batch"),
+
+    # search
+    path("search/", views.search, name="search"),
+
+    # export
+    path("export/", views.export_data, name="export_data"),
+    path("export/archive/", views.export_archive, name="export_archive"),
+
+    # delta sync
+    path("sync/", views.sync, name="sync"),
+
     # favicon error
     path("favicon/ico", favicon_view, name="favicon")
 ]
\ No newline at end of file
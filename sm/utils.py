@@ -1,9 +1,17 @@
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, Exists, IntegerField, Max, OuterRef, Prefetch, Subquery, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
 from twilio.rest import Client
+from array import array
+from bisect import bisect_left
 import random
 
-from .models import Notification
+from .models import Comment, CommentLike, Follow, Notification, PostLike, Tombstone
+from .search import adjust_follower_count
 
 def send_sms_verification(user):
 
@@ -38,4 +46,256 @@ def create_notification(recipient, sender, notification_type, post=None, comment
         notification_type=notification_type,
         post=post,
         comment=comment
-    )
\ No newline at end of file
+    )
+
+
+def insert_ignore(model, **values):
+
+    # single INSERT ... ON CONFLICT DO NOTHING, True when a new row was written
+    meta = model._meta
+    quote = connection.ops.quote_name
+    fields = [(meta.get_field(name), value) for name, value in values.items()]
+
+    columns = ", ".join(quote(field.column) for field, _ in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    params = [field.get_db_prep_save(value, connection) for field, value in fields]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING",
+            params
+        )
+        return cursor.rowcount == 1
+
+
+def apply_toggle(method, model, **lookup):
+
+    # PUT sets, DELETE clears, POST flips; returns (state, changed)
+    if method == "PUT":
+        created = insert_ignore(model, created_at=timezone.now(), **lookup)
+        return True, created
+
+    deleted, _ = model.objects.filter(**lookup).delete()
+
+    if method == "DELETE" or deleted:
+        return False, bool(deleted)
+
+    created = insert_ignore(model, created_at=timezone.now(), **lookup)
+    return True, created
+
+
+# ids are signed 64-bit columns; larger values overflow the database driver
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id_list(raw):
+
+    # "1,2,3" -> [1, 2, 3]; raises ValueError on anything that is not an id
+    if not raw:
+        return []
+
+    ids = []
+    for part in raw.split(","):
+        part = part.strip()
+        if part:
+            pk = int(part)
+            if not 1 <= pk <= MAX_ID:
+                raise ValueError(part)
+            ids.append(pk)
+    return list(dict.fromkeys(ids))
+
+
+def like_state_map(like_model, target_field, ids, user):
+
+    # one grouped query: like count plus whether user is among the likers, per target
+    if not ids:
+        return {}
+
+    rows = (
+        like_model.objects
+        .filter(**{f"{target_field}__in": ids}, user__deleted_at__isnull=True)
+        .values(target_field)
+        .annotate(
+            like_count=Count("id"),
+            is_liked=Max(Case(When(user_id=user.id, then=1), default=0, output_field=IntegerField()))
+        )
+        .order_by()
+    )
+
+    states = {str(target_id): {"like_count": 0, "is_liked": False} for target_id in ids}
+    for row in rows:
+        states[str(row[target_field])] = {
+            "like_count": row["like_count"],
+            "is_liked": bool(row["is_liked"])
+        }
+    return states
+
+
+def record_tombstones(kind, ids, user_id=None):
+
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=object_id, user_id=user_id) for object_id in ids
+    ])
+
+
+def delete_notifications(notifications):
+
+    # delete and leave tombstones behind so sync/ clients drop them too
+    rows = list(notifications.values_list("id", "recipient_id"))
+    if not rows:
+        return 0
+
+    Tombstone.objects.bulk_create([
+        Tombstone(kind="notification", object_id=notification_id, user_id=recipient_id)
+        for notification_id, recipient_id in rows
+    ])
+    Notification.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def soft_delete_post(post):
+
+    # comments, likes and notifications go later, in purge_deleted batches
+    post.soft_delete()
+    record_tombstones("post", [post.id])
+
+
+def restore_post(post):
+
+    # undoes soft_delete_post while purge_deleted has not run yet
+    post.restore()
+    Tombstone.objects.filter(kind="post", object_id=post.id).delete()
+
+
+def soft_delete_user(user):
+
+    post_ids = list(user.posts.values_list("id", flat=True))
+    user.soft_delete()
+    record_tombstones("post", post_ids)
+
+    # the people they follow drop in search ranking now, purge_deleted leaves the counts alone
+    for user_id in Follow.objects.filter(follower=user).values_list("following_id", flat=True):
+        adjust_follower_count(user_id, -1)
+
+
+def record_comment_deletion(comment):
+
+    record_tombstones("comment", [comment.id])
+    delete_notifications(Notification.objects.filter(comment=comment))
+
+
+def count_of(model, field, **filters):
+
+    # correlated COUNT(*) subquery; unlike Count() it does not multiply with other joins
+    counts = (
+        model.objects
+        .filter(**{field: OuterRef("pk")}, **filters)
+        .order_by()
+        .values(field)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def annotate_comments(comments, viewer):
+    return comments.select_related("author").annotate(
+        like_total=count_of(CommentLike, "comment", user__deleted_at__isnull=True),
+        viewer_liked=Exists(CommentLike.objects.filter(comment=OuterRef("pk"), user=viewer))
+    )
+
+
+def annotate_posts(posts, viewer, fields):
+
+    # what PostSerializer would otherwise query per post, limited to the fields it will
+    # render (serializer.fields after ?fields= / ?expand=), so excluded fields cost nothing
+    if isinstance(fields.get("author"), BaseSerializer):
+        posts = posts.select_related("author")
+
+    annotations = {}
+    if "like_count" in fields:
+        annotations["like_total"] = count_of(PostLike, "post", user__deleted_at__isnull=True)
+    if "comment_count" in fields:
+        annotations["comment_total"] = count_of(Comment, "post", author__deleted_at__isnull=True)
+    if "is_liked" in fields:
+        annotations["viewer_liked"] = Exists(PostLike.objects.filter(post=OuterRef("pk"), user=viewer))
+
+    if "comments" in fields:
+        posts = posts.prefetch_related(Prefetch("comments", queryset=annotate_comments(Comment.objects.filter(author__deleted_at__isnull=True), viewer)))
+
+    return posts.annotate(**annotations)
+
+
+def user_stats(user_ids, viewer):
+
+    # follower / following counts for a page of users plus the viewer's follows,
+    # under the serializer context keys UserProfileSerializer reads
+    context = {"following_ids": following_ids(viewer)}
+    if not user_ids:
+        return context
+
+    # soft-deleted accounts stop counting straight away, not when purge_deleted runs
+    live_followers = Follow.objects.filter(following_id__in=user_ids, follower__deleted_at__isnull=True)
+    live_following = Follow.objects.filter(follower_id__in=user_ids, following__deleted_at__isnull=True)
+    for key, field, follows in (
+        ("follower_counts", "following_id", live_followers),
+        ("following_counts", "follower_id", live_following)
+    ):
+        rows = follows.order_by().values(field).annotate(total=Count("id"))
+        context[key] = {row[field]: row["total"] for row in rows}
+
+    return context
+
+
+class FollowingIds:
+    """
+    The ids a user follows, as a sorted array of 64-bit ints.
+
+    Eight bytes an id in the cache instead of a pickled set; membership is a bisect.
+    """
+
+    __slots__ = ("ids",)
+
+    def __init__(self, ids=None):
+        self.ids = ids if ids is not None else array("q")
+
+    def __contains__(self, user_id):
+        index = bisect_left(self.ids, user_id)
+        return index < len(self.ids) and self.ids[index] == user_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def following_cache_key(user_id):
+    return f"following_ids:{user_id}"
+
+def following_rows(user_id):
+    return Follow.objects.filter(follower_id=user_id).order_by("following_id").values_list("following_id", flat=True)
+
+def following_ids(user):
+
+    # read once per request and kept on the user object, the way ModelBackend keeps _perm_cache
+    if not user.is_authenticated:
+        return FollowingIds()
+
+    if not hasattr(user, "_following_ids"):
+        key = following_cache_key(user.id)
+        ids = cache.get(key)
+        if ids is None:
+            ids = array("q", following_rows(user.id))
+            cache.set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+        user._following_ids = FollowingIds(ids)
+
+    return user._following_ids
+
+def forget_following(user_ids):
+
+    # dropped once the follow rows are committed, so a concurrent request cannot
+    # reload the old rows and cache them again
+    keys = [following_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,25 +1,76 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from urllib.parse import quote
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from .batch import MAX_BATCH_OPERATIONS, run_batch
+from .export import stream_ndjson, stream_zip
+from .pagination import CreatedAtCursorPagination
 from .permissions import IsPhoneVerified
+from .compression import CachedBody
+from .renderers import CachedBodyResponse, streaming_json_response
 from .serializers import (
     UserRegistrationSerializer, 
     CustomTokenObtainPairSerializer, 
+    CustomTokenRefreshSerializer,
     UserUpdateSerializer, 
     UserProfileSerializer, 
+    SimpleAutoSerializer,
+    CompactUserSerializer,
+    FollowSuggestionSerializer,
     PostSerializer, 
     CommentSerializer,
-    NotificationSerializer
+    NotificationSerializer,
+    ProgressItemSerializer
 )
-from .models import Post, CustomUser, Follow, PostLike, Comment, CommentLike, Notification
-from .utils import send_sms_verification, create_notification
+from .models import Post, CustomUser, Follow, FollowSuggestion, PostLike, Comment, CommentLike, Notification, Tombstone, progress_cache_key
+from .search import search_post_ids, search_comment_ids, search_user_ids, adjust_follower_count
+from .utils import (
+    send_sms_verification,
+    create_notification,
+    apply_toggle,
+    parse_id_list,
+    like_state_map,
+    delete_notifications,
+    soft_delete_post,
+    soft_delete_user,
+    record_comment_deletion,
+    annotate_comments,
+    annotate_posts,
+    user_stats,
+    following_ids,
+    forget_following,
+    MAX_ID
+)
+
+MAX_LIKE_STATE_IDS = 200
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+USER_SEARCH_LIMIT = 10
+MAX_SUGGESTIONS = 50
+FEED_CHUNK_SIZE = 200
+PROGRESS_ITEMS = 5
+# longer following lists go to SQLite as a subquery rather than bound parameters
+FOLLOWING_IN_LIST_LIMIT = 500
+SYNC_PAGE_SIZE = 500
+# re-send a little of the previous window so rows committed late are not skipped
+SYNC_OVERLAP = timedelta(seconds=2)
+SYNC_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# the streams a sync token holds a cursor for, in token order
+SYNC_STREAMS = ("posts", "comments", "notifications", "deleted")
 
 # verification data
 @api_view(["POST"])
@@ -35,9 +86,21 @@ def register_user(request):
 
     return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def current_user_row(request):
+
+    # request.user may be CachedJWTAuthentication's cached copy; saving that would write
+    # every old column back over whatever changed since (a deactivation, a new code)
+    user = CustomUser.objects.filter(pk=request.user.pk, is_active=True).first()
+    if user is None:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def send_phone_verification(request):
@@ -50,7 +113,7 @@ def send_phone_verification(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    user = request.user
+    user = current_user_row(request)
     user.phone_number = phone_number
     user.save()
 
@@ -78,7 +141,7 @@ def verify_phone(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = request.user
+    user = current_user_row(request)
 
     if user.phone_verification_code != code:
         return Response(
@@ -106,13 +169,20 @@ def verify_phone(request):
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
 def update_user(request):
-    user = request.user
+    user = current_user_row(request)
     ser = UserUpdateSerializer(user, data=request.data, partial=True)
     if ser.is_valid():
         ser.save()
         return Response(ser.data)
     return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def delete_user(request):
+    with transaction.atomic():
+        soft_delete_user(request.user)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_current_user(request):
@@ -120,6 +190,36 @@ def get_current_user(request):
     ser = UserProfileSerializer(user)
     return Response(ser.data)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_progress(request):
+    cache_key = progress_cache_key(request.user.id)
+    body = cache.get(cache_key)
+
+    if body is None:
+        posts = Post.objects.filter(author=request.user)
+        fields = ProgressItemSerializer.Meta.fields
+
+        # one GROUP BY over the (author, status) index instead of the whole post list
+        counts = dict.fromkeys((value for value, _ in Post.status_enum), 0)
+        for row in posts.order_by().values("status").annotate(total=Count("id")):
+            counts[row["status"]] = row["total"]
+
+        progress = {
+            "total": sum(counts.values()),
+            "counts": counts,
+            "recent": ProgressItemSerializer(
+                posts.order_by("-updated_at", "-id").values(*fields)[:PROGRESS_ITEMS], many=True
+            ).data,
+            "oldest_outstanding": ProgressItemSerializer(
+                posts.exclude(status="sent").order_by("created_at", "id").values(*fields)[:PROGRESS_ITEMS], many=True
+            ).data
+        }
+        body = CachedBody(progress)
+        cache.set(cache_key, body, settings.PROGRESS_CACHE_TIMEOUT)
+
+    return CachedBodyResponse(body)
+
 # Basic post data
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -139,8 +239,8 @@ def create_post(request):
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
 def update_post(request, pk):
-    post = Post.objects.get(id=pk)
-    if post.author != request.user:
+    post = annotate_posts(Post.objects.filter(id=pk), request.user, rendered_fields(PostSerializer, request)).get()
+    if post.author_id != request.user.id:
         return Response({"error": "You can only edit your own posts"}, status=status.HTTP_403_FORBIDDEN)
     ser = PostSerializer(
         post, data=request.data,
@@ -162,40 +262,42 @@ def delete_post(request, pk):
     post = Post.objects.get(id=pk)
     if post.author != user:
         return Response({"error": "You are not the author of this blog"}, status=status.HTTP_403_FORBIDDEN)
-    post.delete()
+    with transaction.atomic():
+        soft_delete_post(post)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Like and comment data
-@api_view(["POST"])
+@api_view(["POST", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def like_unlike_post(request, pk):
-    post = Post.objects.filter(id=pk).first()
-    like = PostLike.objects.filter(user=request.user, post=post).first()
-
-    if like:
-        like.delete()
-
-        Notification.objects.filter(
-            recipient=post.author,
-            sender=request.user,
-            notification_type="like_post",
-            post=post
-        ).delete()
-
-        return Response({"liked": False}, status=status.HTTP_200_OK)
-
-    else:
-        PostLike.objects.create(user=request.user, post=post)
-
-        create_notification(
-            recipient=post.author,
-            sender=request.user,
-            notification_type="like_post",
-            post=post
-        )
-
+    post = Post.objects.select_related("author").filter(id=pk).first()
+
+    if post is None:
+        return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        liked, changed = apply_toggle(request.method, PostLike, user_id=request.user.id, post_id=post.id)
+
+        if changed and liked:
+            create_notification(
+                recipient=post.author,
+                sender=request.user,
+                notification_type="like_post",
+                post=post
+            )
+        elif changed:
+            delete_notifications(Notification.objects.filter(
+                recipient=post.author,
+                sender=request.user,
+                notification_type="like_post",
+                post=post
+            ))
+
+    if changed and liked:
         return Response({"liked": True}, status=status.HTTP_201_CREATED)
 
+    return Response({"liked": liked}, status=status.HTTP_200_OK)
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_comment(request, pk):
@@ -251,119 +353,202 @@ def delete_comment(request, pk):
             {"error": "You can only delete your own comments or comments on your posts."},
             status=status.HTTP_403_FORBIDDEN
         )
-    comment.delete()
+    with transaction.atomic():
+        record_comment_deletion(comment)
+        comment.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
-@api_view(["POST"])
+@api_view(["POST", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def like_unlike_comment(request, pk):
-    comment = Comment.objects.filter(id=pk).first()
-
-    like = CommentLike.objects.filter(
-        user=request.user,
-        comment=comment
-    ).first()
+    comment = Comment.objects.select_related("author").filter(id=pk).first()
+
+    if comment is None:
+        return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        liked, changed = apply_toggle(request.method, CommentLike, user_id=request.user.id, comment_id=comment.id)
+
+        if changed and liked:
+            create_notification(
+                recipient=comment.author,
+                sender=request.user,
+                notification_type="like_comment",
+                comment=comment
+            )
+        elif changed:
+            delete_notifications(Notification.objects.filter(
+                recipient=comment.author,
+                sender=request.user,
+                notification_type="like_comment",
+                comment=comment
+            ))
+
+    if changed and liked:
+        return Response({"liked": True}, status=status.HTTP_201_CREATED)
 
-    if like:
-        like.delete()
+    return Response({"liked": liked}, status=status.HTTP_200_OK)
 
-        Notification.objects.filter(
-            recipient=comment.author,
-            sender=request.user,
-            notification_type="like_comment",
-            comment=comment
-        ).delete()
-
-        return Response({"liked": False}, status=status.HTTP_200_OK)
-    else:
-        CommentLike.objects.create(user=request.user, comment=comment)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def see_post_likes(request, pk):
+    if not Post.objects.filter(id=pk).exists():
+        return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        create_notification(
-            recipient=comment.author,
-            sender=request.user,
-            notification_type="like_comment",
-            comment=comment
-        )
+    likes = PostLike.objects.filter(post_id=pk, user__deleted_at__isnull=True).select_related("user")
 
-        return Response({"liked": True}, status=status.HTTP_201_CREATED)
+    return paginated_user_list(request, likes, "user", "likes")
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def see_post_likes(request, pk):
-    post = Post.objects.filter(id=pk).first()
-
-    likes = PostLike.objects.filter(post=post).select_related("user")
+def like_states(request):
+    try:
+        post_ids = parse_id_list(request.GET.get("posts"))
+        comment_ids = parse_id_list(request.GET.get("comments"))
+    except ValueError:
+        return Response(
+            {"error": "posts and comments must be comma separated ids"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    users = [like.user for like in likes]
-    ser = UserProfileSerializer(users, many=True)
+    if len(post_ids) + len(comment_ids) > MAX_LIKE_STATE_IDS:
+        return Response(
+            {"error": f"You can look up at most {MAX_LIKE_STATE_IDS} ids at once"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    return Response(ser.data)
+    return Response({
+        "posts": like_state_map(PostLike, "post_id", post_ids, request.user),
+        "comments": like_state_map(CommentLike, "comment_id", comment_ids, request.user)
+    })
 
 # Follow data
-@api_view(["POST"])
+@api_view(["POST", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def follow_unfollow(request, username):
     user_to_follow = CustomUser.objects.filter(username=username).first()
 
+    if user_to_follow is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
     if user_to_follow == request.user:
         return Response({"error": "You cannot follow yourself"}, status= status.HTTP_400_BAD_REQUEST)
 
-    follow = Follow.objects.filter(follower=request.user, following=user_to_follow).first()
-
-    if follow:
-        follow.delete()
-
-        Notification.objects.filter(
-            recipient=user_to_follow,
-            sender=request.user,
-            notification_type="follow"
-        ).delete()
-
-        return Response({"following": False}, status=status.HTTP_200_OK)
-    else:
-        Follow.objects.create(follower=request.user, following=user_to_follow)
-
-        create_notification(
-            recipient=user_to_follow,
-            sender=request.user,
-            notification_type="follow"
+    with transaction.atomic():
+        following, changed = apply_toggle(
+            request.method, Follow,
+            follower_id=request.user.id,
+            following_id=user_to_follow.id
         )
 
+        if changed and following:
+            create_notification(
+                recipient=user_to_follow,
+                sender=request.user,
+                notification_type="follow"
+            )
+        elif changed:
+            delete_notifications(Notification.objects.filter(
+                recipient=user_to_follow,
+                sender=request.user,
+                notification_type="follow"
+            ))
+
+        if changed:
+            adjust_follower_count(user_to_follow.id, 1 if following else -1)
+            forget_following([request.user.id])
+
+    if changed and following:
         return Response({"following": True}, status=status.HTTP_201_CREATED)
 
+    return Response({"following": following}, status=status.HTTP_200_OK)
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def see_user_followers(request, username):
     user = CustomUser.objects.filter(username=username).first()
-    followers = Follow.objects.filter(following=user).select_related("follower")
-    users = [follow.follower for follow in followers]
-    ser = UserProfileSerializer(users, many=True)
 
-    return Response({"followers": ser.data})
+    if user is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    followers = Follow.objects.filter(following=user, follower__deleted_at__isnull=True).select_related("follower")
+
+    return paginated_user_list(request, followers, "follower", "followers")
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def see_user_following(request, username):
     user = CustomUser.objects.filter(username=username).first()
-    following = Follow.objects.filter(follower=user).select_related("following")
-    users = [follow.following for follow in following]
-    ser = UserProfileSerializer(users, many=True)
 
-    return Response({"following": ser.data})
+    if user is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    following = Follow.objects.filter(follower=user, following__deleted_at__isnull=True).select_related("following")
+
+    return paginated_user_list(request, following, "following", "following")
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def follow_suggestions(request):
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # people followed since the last build are dropped in the same statement
+    already_following = Follow.objects.filter(follower=request.user, following=OuterRef("suggested_id"))
+    suggestions = (
+        FollowSuggestion.objects
+        .filter(user=request.user, suggested__deleted_at__isnull=True)
+        .exclude(Exists(already_following))
+        .select_related("suggested")
+        .order_by("-mutual_count", "suggested_id")[:limit]
+    )
+
+    ser = FollowSuggestionSerializer(suggestions, many=True, context={"request": request})
+
+    return Response({"suggestions": ser.data})
+
+def paginated_user_list(request, queryset, user_field, key):
+
+    # one cursor page of users plus a single query for the viewer's follow state
+    paginator = CreatedAtCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    users = [getattr(row, user_field) for row in page]
+
+    ser = CompactUserSerializer(
+        users, many=True,
+        context={"request": request, "following_ids": following_ids(request.user)}
+    )
+
+    return Response({
+        key: ser.data,
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link()
+    })
 
 # Notifications data
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
-    notifications = Notification.objects.filter(recipient=request.user)
-    ser = NotificationSerializer(notifications, many=True, context={"request": request})
+    notifications = (
+        Notification.objects
+        .filter(recipient=request.user, sender__deleted_at__isnull=True)
+        .select_related("sender", "post")
+    )
 
     unread_count = notifications.filter(is_read=False).count()
 
-    return Response({
-        "notifications": ser.data,
-        "unread_count": unread_count
-    })
+    with_sender = isinstance(rendered_fields(NotificationSerializer, request).get("sender"), UserProfileSerializer)
+
+    return streaming_json_response(
+        serialized_pages(
+            notifications.iterator(chunk_size=FEED_CHUNK_SIZE), NotificationSerializer, request,
+            lambda notification: [notification.sender_id] if with_sender else []
+        ),
+        envelope={"unread_count": unread_count},
+        key="notifications"
+    )
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -379,13 +564,184 @@ def mark_notification_read(request, pk):
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def delete_notification(request, pk):
-    notification = Notification.objects.filter(id=pk, recipient=request.user).first()
-
-    notification.delete()
+    delete_notifications(Notification.objects.filter(id=pk, recipient=request.user))
 
     return Response(status=status.HTTP_204_NO_CONTENT)
 
+# Batched writes
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    operations = request.data.get("operations") if isinstance(request.data, dict) else None
+
+    if not isinstance(operations, list) or not operations:
+        return Response({"error": "operations must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return Response(
+            {"error": f"A batch can hold at most {MAX_BATCH_OPERATIONS} operations"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({"results": run_batch(request.user, operations)})
+
+# Data export
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_data(request):
+    response = StreamingHttpResponse(stream_ndjson(request.user), content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{request.user.username}-export.ndjson"'
+    return response
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_archive(request):
+    response = StreamingHttpResponse(stream_zip(request.user), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{request.user.username}-export.zip"'
+    return response
+
+# Delta sync
+def sync_token(cursors):
+
+    # one "<microseconds since the epoch>.<last id>" pair per SYNC_STREAMS entry; the id
+    # lets a page that ends inside a run of equal timestamps resume after its last row
+    return "-".join(f"{(moment - SYNC_EPOCH) // timedelta(microseconds=1)}.{pk}" for moment, pk in cursors)
+
+def parse_sync_token(token):
+    parts = token.split("-")
+    if len(parts) == 1:
+        # a bare timestamp: every stream starts from it
+        parts *= len(SYNC_STREAMS)
+    if len(parts) != len(SYNC_STREAMS):
+        raise ValueError(token)
+
+    cursors = []
+    for part in parts:
+        micros, _, pk = part.partition(".")
+        pk = int(pk or 0)
+        if not 0 <= pk <= MAX_ID:
+            raise ValueError(token)
+        cursors.append((SYNC_EPOCH + timedelta(microseconds=int(micros)), pk))
+    return cursors
+
+def sync_page(queryset, field, cursor, fallback):
+
+    # the rows after cursor in (field, id) order, plus the cursor to resume from:
+    # the last row's when the page is full, fallback once the stream is drained
+    if cursor is not None:
+        moment, pk = cursor
+        queryset = queryset.filter(Q(**{f"{field}__gt": moment}) | Q(**{field: moment, "id__gt": pk}))
+
+    rows = list(queryset.order_by(field, "id")[:SYNC_PAGE_SIZE + 1])
+    if len(rows) > SYNC_PAGE_SIZE:
+        rows = rows[:SYNC_PAGE_SIZE]
+        return rows, (getattr(rows[-1], field), rows[-1].id), True
+
+    return rows, fallback, False
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    started = timezone.now()
+    since = request.GET.get("since")
+    cursors = [None] * len(SYNC_STREAMS)
+
+    if since:
+        try:
+            cursors = parse_sync_token(since)
+        except (ValueError, OverflowError):
+            return Response({"error": "since must be a token from a previous sync"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # deletions older than this have been purged, the client has to start over
+        if min(moment for moment, _ in cursors) < started - settings.SYNC_TOMBSTONE_RETENTION:
+            return Response({"error": "Sync token expired, do a full sync"}, status=status.HTTP_410_GONE)
+
+    post_fields = rendered_fields(PostSerializer, request)
+    with_comment_author = isinstance(rendered_fields(CommentSerializer, request).get("author"), UserProfileSerializer)
+    with_sender = isinstance(rendered_fields(NotificationSerializer, request).get("sender"), UserProfileSerializer)
+
+    # (rows, serializer, users rendered per row), batched the same way as the feed
+    changes = {
+        "posts": (
+            annotate_posts(Post.objects.all(), request.user, post_fields),
+            PostSerializer,
+            post_user_ids(post_fields)
+        ),
+        "comments": (
+            annotate_comments(Comment.objects.filter(post__deleted_at__isnull=True), request.user),
+            CommentSerializer,
+            lambda comment: [comment.author_id] if with_comment_author else []
+        ),
+        "notifications": (
+            Notification.objects.filter(recipient=request.user).select_related("sender", "post"),
+            NotificationSerializer,
+            lambda notification: [notification.sender_id] if with_sender else []
+        ),
+    }
+
+    # a drained stream re-sends a little of its window next time, so rows committed late are not skipped
+    fallback = (started - SYNC_OVERLAP, 0)
+
+    data = {}
+    next_cursors = []
+    has_more = False
+    for (key, (queryset, serializer_class, user_ids)), cursor in zip(changes.items(), cursors):
+        rows, next_cursor, truncated = sync_page(queryset, "updated_at", cursor, fallback)
+        data[key] = list(serialized_pages(rows, serializer_class, request, user_ids))
+        next_cursors.append(next_cursor)
+        has_more |= truncated
+
+    deleted = {"posts": [], "comments": [], "notifications": []}
+    if since:
+        tombstones, next_cursor, truncated = sync_page(
+            Tombstone.objects.filter(Q(user__isnull=True) | Q(user=request.user)),
+            "deleted_at", cursors[-1], fallback
+        )
+        for tombstone in tombstones:
+            deleted[f"{tombstone.kind}s"].append(tombstone.object_id)
+        next_cursors.append(next_cursor)
+        has_more |= truncated
+    else:
+        # a full sync has nothing to delete
+        next_cursors.append(fallback)
+
+    return Response({
+        **data,
+        "deleted": deleted,
+        "next": sync_token(next_cursors),
+        "has_more": has_more
+    })
+
 # Display data
+def rendered_fields(serializer_class, request):
+    # the serializer's fields once ?fields= / ?expand= have been applied
+    return serializer_class(context={"request": request}).fields
+
+def post_user_ids(fields):
+
+    # the users a post renders with UserProfileSerializer: its author and, when the
+    # comments are included, every comment author
+    with_author = isinstance(fields.get("author"), UserProfileSerializer)
+    with_comments = "comments" in fields
+
+    def user_ids(post):
+        ids = [post.author_id] if with_author else []
+        if with_comments:
+            ids.extend(comment.author_id for comment in post.comments.all())
+        return ids
+
+    return user_ids
+
+def serialized_pages(rows, serializer_class, request, user_ids):
+
+    # serializes FEED_CHUNK_SIZE rows at a time; rows come annotated (utils.annotate_posts)
+    # and the nested users' follow stats are fetched once per page, not once per user
+    rows = iter(rows)
+    while page := list(islice(rows, FEED_CHUNK_SIZE)):
+        ids = {user_id for obj in page for user_id in user_ids(obj)}
+        context = {"request": request, **user_stats(ids, request.user)}
+        yield from serializer_class(page, many=True, context=context).data
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def home_feed(request):
@@ -393,45 +749,112 @@ def home_feed(request):
     filter_type = request.GET.get("filter", "all")
 
     if filter_type == "following":
-        following_users = Follow.objects.filter(follower=request.user).values_list("following", flat=True)
-        posts = Post.objects.filter(author__in=following_users).order_by("-created_at")
+        following = following_ids(request.user)
+        if len(following) > FOLLOWING_IN_LIST_LIMIT:
+            authors = Follow.objects.filter(follower=request.user).values_list("following", flat=True)
+        else:
+            authors = list(following)
+        posts = Post.objects.filter(author__in=authors).order_by("-created_at")
+    elif filter_type == "popular":
+        # hot_score is precomputed by refresh_hot_scores, this is a plain index scan
+        posts = Post.objects.order_by("-hot_score", "-id")
     else:
         posts = Post.objects.all().order_by("-created_at")
 
-    ser = PostSerializer(
-        posts,
-        many=True,
-        context={"request": request}
+    fields = rendered_fields(PostSerializer, request)
+    posts = annotate_posts(posts, request.user, fields)
+
+    return streaming_json_response(
+        serialized_pages(posts.iterator(chunk_size=FEED_CHUNK_SIZE), PostSerializer, request, post_user_ids(fields))
     )
-    return Response(ser.data)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_profile(request, username):
     user = CustomUser.objects.filter(username=username).first()
-    posts = Post.objects.filter(author=user).order_by("-created_at")
 
-    posts_ser = PostSerializer(
-        posts, many=True,
-        context={"request": request}
-    )
+    if user is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    is_following = Follow.objects.filter(follower=request.user, following=user).exists()
-    follower_count = user.followers.count()
-    following_count = user.following.count()
-    post_count = user.posts.count()
+    fields = rendered_fields(PostSerializer, request)
+    posts = annotate_posts(Post.objects.filter(author=user).order_by("-created_at"), request.user, fields)
 
     data = {
         "id": user.id,
         "username": user.username,
         "first_name": user.first_name,
         "profile_picture": user.profile_picture.url if user.profile_picture else None,
-        "is_following": is_following,
-        "follower_count": follower_count,
-        "following_count": following_count,
-        "post_count": post_count,
+        "is_following": user.id in following_ids(request.user),
+        "follower_count": user.followers.filter(follower__deleted_at__isnull=True).count(),
+        "following_count": user.following.filter(following__deleted_at__isnull=True).count(),
+        "post_count": user.posts.count(),
         "is_own_profile": user == request.user,
-        "posts": posts_ser.data
+        "posts": list(serialized_pages(posts, PostSerializer, request, post_user_ids(fields)))
     }
 
-    return Response(data)
\ No newline at end of file
+    return Response(data)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search(request):
+    query = request.GET.get("q", "").strip()
+    search_type = request.GET.get("type", "posts")
+
+    if not query:
+        return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if search_type not in ("posts", "comments"):
+        return Response({"error": "type must be posts or comments"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "page and page_size must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    offset = (page - 1) * page_size
+
+    if search_type == "posts":
+        ids = search_post_ids(query, page_size + 1, offset)
+        fields = rendered_fields(PostSerializer, request)
+        rows = annotate_posts(Post.objects.filter(id__in=ids[:page_size]), request.user, fields)
+        serializer_class = PostSerializer
+        user_ids = post_user_ids(fields)
+    else:
+        ids = search_comment_ids(query, page_size + 1, offset)
+        rows = annotate_comments(
+            Comment.objects.filter(id__in=ids[:page_size], post__deleted_at__isnull=True), request.user
+        )
+        serializer_class = CommentSerializer
+        with_author = isinstance(rendered_fields(CommentSerializer, request).get("author"), UserProfileSerializer)
+        user_ids = lambda comment: [comment.author_id] if with_author else []
+
+    # id__in loses the bm25 ordering, put it back
+    found = {row.id: row for row in rows}
+    results = [found[pk] for pk in ids[:page_size] if pk in found]
+
+    return Response({
+        "results": list(serialized_pages(results, serializer_class, request, user_ids)),
+        "page": page,
+        "has_more": len(ids) > page_size
+    })
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_users(request):
+    query = request.GET.get("q", "").strip().casefold()
+
+    if not query:
+        return Response({"results": []})
+
+    cache_key = f"user_search:{quote(query)}"
+    body = cache.get(cache_key)
+
+    if body is None:
+        ids = search_user_ids(query, USER_SEARCH_LIMIT)
+        found = CustomUser.objects.in_bulk(ids)
+        results = SimpleAutoSerializer([found[pk] for pk in ids if pk in found], many=True).data
+        body = CachedBody({"results": results})
+        cache.set(cache_key, body, settings.USER_SEARCH_CACHE_TIMEOUT)
+
+    return CachedBodyResponse(body)
\ No newline at end of file